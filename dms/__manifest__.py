@@ -3,7 +3,7 @@
 {
     "name": "Document Management System",
     "summary": """Document Management System for Odoo""",
-    "version": "17.0.1.2.5",
+    "version": "17.0.1.3.0",
     "category": "Document Management",
     "license": "LGPL-3",
     "website": "https://www.superxtech.io/products",
@@ -26,6 +26,7 @@
         "template/portal.xml",
         # Data
         "data/onboarding_data.xml",
+        "data/ir_cron.xml",
         # Views
         "views/dms_tag.xml",
         "views/dms_category.xml",
@@ -34,6 +35,8 @@
         "views/storage.xml",
         "views/dms_access_groups_views.xml",
         "views/res_config_settings.xml",
+        "views/dms_integrity_views.xml",
+        "views/dms_permission_explain_views.xml",
         "views/menu.xml",
         # Wizard
         "wizards/wizard_dms_file_move_views.xml",
@@ -1,2 +1,5 @@
 from . import main
 from . import portal
+from . import upload
+from . import version
+from . import thumbnail
@@ -1,11 +1,10 @@
 # Copyright 2020-2021 Tecnativa - Víctor Martínez
 # Copyright 2024 Subteno - Timothée VANNIER (https://www.subteno.com).
 # License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
-import base64
 from typing import Optional  # noqa # pylint: disable=unused-import
 
-from odoo import _, http
-from odoo.http import content_disposition, request
+from odoo import SUPERUSER_ID, _, api, http
+from odoo.http import Response, Stream, content_disposition, request
 from odoo.osv.expression import OR
 
 from odoo.addons.portal.controllers.portal import CustomerPortal
@@ -279,10 +278,70 @@ class CustomerPortal(CustomerPortal):
 
         if res.attachment_id and request.env.user.has_group("base.group_portal"):
             res = res.sudo()
-        file_content = base64.b64decode(res.content)
-        content_type = ("Content-Type", "application/octet-stream")
-        disposition_content = (
-            "Content-Disposition",
-            content_disposition(res.name),
+        return self._dms_file_response(res)
+
+    def _dms_file_response(self, dms_file):
+        """
+        Build a streamed download response for a file.
+
+        Content stored in an attachment (filestore or attachment storage) is
+        served by werkzeug straight from disk, content stored in the database is
+        read in slices. Both honour the HTTP ``Range`` header.
+
+        :param odoo.model.dms_file dms_file: the file to download
+
+        :return: response
+        :rtype: odoo.http.Response
+        """
+        attachment = dms_file._get_content_attachment()
+        if attachment:
+            stream = Stream.from_attachment(attachment)
+            stream.mimetype = "application/octet-stream"
+            stream.download_name = dms_file.name
+            return stream.get_response(as_attachment=True)
+        size = dms_file._get_content_binary_size()
+        headers = [
+            ("Content-Type", "application/octet-stream"),
+            ("Content-Disposition", content_disposition(dms_file.name)),
+            ("Accept-Ranges", "bytes"),
+        ]
+        start, stop, status = 0, size, 200
+        http_range = request.httprequest.range
+        if http_range:
+            byte_range = http_range.range_for_length(size)
+            if byte_range is None:
+                return Response(
+                    status=416, headers=[("Content-Range", "bytes */%s" % size)]
+                )
+            start, stop = byte_range
+            status = 206
+            headers.append(
+                ("Content-Range", http_range.to_content_range_header(size))
+            )
+        headers.append(("Content-Length", str(stop - start)))
+        return Response(
+            self._dms_iter_content_binary(
+                request.env.registry, dms_file.id, start, stop
+            ),
+            status=status,
+            headers=headers,
+            direct_passthrough=True,
         )
-        return request.make_response(file_content, [content_type, disposition_content])
+
+    def _dms_iter_content_binary(self, registry, dms_file_id, start, stop):
+        """
+        Yield the database content of a file once the response is sent.
+
+        The request cursor is closed by then, so the chunks are read through a
+        dedicated one. Access has already been checked by the caller.
+
+        :param odoo.modules.registry.Registry registry: registry of the database
+        :param int dms_file_id: dms_file_id
+        :param int start: first byte to send
+        :param int stop: byte after the last one to send
+        """
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            yield from env["dms.file"].browse(dms_file_id)._iter_content_binary(
+                start, stop
+            )
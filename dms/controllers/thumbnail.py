@@ -0,0 +1,46 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+from odoo import http
+from odoo.http import Response, request
+
+THUMBNAIL_SIZE = 128
+
+
+class DmsThumbnailController(http.Controller):
+    @http.route(
+        "/dms/file/<int:dms_file_id>/thumbnail/<string:checksum>",
+        type="http",
+        auth="public",
+    )
+    def file_thumbnail(self, dms_file_id, checksum, crop=None, access_token=None):
+        """Serve the thumbnail of a file for as long as its content is the one
+        of ``checksum``, the URL changing with the content."""
+        dms_file = request.env["dms.file"].browse(dms_file_id).exists()
+        if access_token:
+            dms_file = dms_file.sudo()
+            if not dms_file or not dms_file.check_access_token(access_token):
+                return request.not_found()
+        elif not dms_file or not dms_file.permission_read:
+            return request.not_found()
+        if checksum != dms_file.checksum:
+            # Outdated URL, not cached
+            url = dms_file.icon_url
+            if access_token:
+                url += "&access_token=%s" % access_token
+            return request.redirect(url)
+        etag = f"{checksum}-{THUMBNAIL_SIZE}-{int(bool(crop))}"
+        # Private, the access depends on the user or on the token
+        cache_control = f"private, max-age={http.STATIC_CACHE_LONG}, immutable"
+        headers = [("ETag", f'"{etag}"'), ("Cache-Control", cache_control)]
+        if request.httprequest.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+        stream = request.env["ir.binary"]._get_image_stream_from(
+            dms_file,
+            "image_128",
+            width=THUMBNAIL_SIZE,
+            height=THUMBNAIL_SIZE,
+            crop=bool(crop),
+        )
+        stream.etag = etag
+        response = stream.get_response(immutable=True)
+        response.headers["Cache-Control"] = cache_control
+        return response
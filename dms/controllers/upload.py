@@ -0,0 +1,45 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+from odoo import http
+from odoo.exceptions import UserError
+from odoo.http import request
+
+
+class DmsUploadController(http.Controller):
+    """Chunked and resumable upload of files into a directory.
+
+    A client opens a session with ``/dms/upload/init``, sends the content with
+    as many ``/dms/upload/chunk`` requests as needed, then creates the file with
+    ``/dms/upload/finalize``. After a dropped connection, ``/dms/upload/status``
+    tells from which offset to resume.
+    """
+
+    def _session_values(self, session):
+        return {"token": session.token, "offset": session.received}
+
+    @http.route("/dms/upload/init", type="json", auth="user")
+    def upload_init(self, directory_id, name, size, **_kwargs):
+        session = request.env["dms.upload.session"].start(
+            int(directory_id), name, int(size)
+        )
+        return self._session_values(session)
+
+    @http.route("/dms/upload/status", type="json", auth="user")
+    def upload_status(self, token, **_kwargs):
+        session = request.env["dms.upload.session"]._get_by_token(token)
+        return self._session_values(session)
+
+    @http.route("/dms/upload/chunk", type="http", auth="user", methods=["POST"])
+    def upload_chunk(self, token, offset, chunk, checksum=None, **_kwargs):
+        try:
+            session = request.env["dms.upload.session"]._get_by_token(token)
+            received = session.append_chunk(int(offset), chunk.read(), checksum)
+        except UserError as error:
+            return request.make_json_response({"error": str(error)}, status=400)
+        return request.make_json_response({"token": token, "offset": received})
+
+    @http.route("/dms/upload/finalize", type="json", auth="user")
+    def upload_finalize(self, token, context=None, **_kwargs):
+        session = request.env["dms.upload.session"]._get_by_token(token)
+        # The context of the view, with the default values of the new file
+        dms_file = session.with_context(**(context or {})).finalize()
+        return {"id": dms_file.id, "name": dms_file.name}
@@ -0,0 +1,31 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+from odoo import SUPERUSER_ID, api, http
+from odoo.http import Response, content_disposition, request
+
+
+class DmsVersionController(http.Controller):
+    @http.route(
+        "/dms/file/version/<int:version_id>/download", type="http", auth="user"
+    )
+    def version_download(self, version_id, **_kwargs):
+        """Stream a previous version of a file."""
+        version = request.env["dms.file.version"].browse(version_id).exists()
+        if not version:
+            return request.not_found()
+        version._check_file_access("read")
+        return Response(
+            self._dms_iter_version_content(request.env.registry, version.id),
+            headers=[
+                ("Content-Type", "application/octet-stream"),
+                ("Content-Disposition", content_disposition(version.file_id.name)),
+                ("Content-Length", str(version.size)),
+            ],
+            direct_passthrough=True,
+        )
+
+    def _dms_iter_version_content(self, registry, version_id):
+        """Rebuild the version once the response is sent, through a dedicated
+        cursor as the request one is closed by then."""
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            yield from env["dms.file.version"].browse(version_id)._iter_content()
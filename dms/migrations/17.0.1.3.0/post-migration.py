@@ -0,0 +1,10 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """Fill the totals of the existing directories once, they are maintained
+    along with the changes of the directories and files from then on."""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env["dms.directory"]._repair_totals()
@@ -0,0 +1,32 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """The permission fields used to be stored and always true, so the record
+    rules filtering on them granted every operation on every directory and
+    file. They are now computed from the access groups and the inherited
+    access: warn about the directories nobody reaches through them anymore."""
+    cr.execute(
+        """
+        SELECT COUNT(*)
+        FROM dms_directory AS directory
+        JOIN dms_storage AS storage ON storage.id = directory.storage_id
+        WHERE NOT COALESCE(storage.inherit_access_from_parent_record, FALSE)
+            AND NOT EXISTS (
+                SELECT 1
+                FROM dms_directory_complete_groups_rel AS rel
+                WHERE rel.aid = directory.id
+            )
+        """
+    )
+    count = cr.fetchone()[0]
+    if count:
+        _logger.warning(
+            "%s DMS directories have no access group and are no longer "
+            "accessible to users: add access groups to them.",
+            count,
+        )
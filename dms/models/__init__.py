@@ -8,8 +8,17 @@ from . import dms_security_mixin
 from . import abstract_dms_mixin
 
 from . import storage
+from . import dms_blob
+from . import dms_pack_segment
 from . import directory
+from . import dms_directory_user_permission
 from . import dms_file
+from . import dms_file_version
+from . import dms_upload_session
+from . import dms_scrub
+from . import dms_storage_migration
+from . import dms_thumbnail_queue
+from . import dms_permission_explain
 
 from . import onboarding_onboarding
 from . import onboarding_onboarding_step
@@ -17,6 +26,8 @@ from . import dms_category
 from . import tag
 
 from . import res_company
+from . import res_groups
+from . import res_users
 from . import res_config_settings
 from . import ir_attachment
 from . import ir_binary
@@ -3,9 +3,15 @@
 # Copyright 2024 Timothée Vannier - Subteno (https://www.subteno.com).
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import logging
+
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
 
+_logger = logging.getLogger(__name__)
+
+PERMISSIONS = ("create", "unlink", "write", "read")
+
 
 class DmsAccessGroups(models.Model):
     _name = "dms.access.group"
@@ -22,30 +28,19 @@ class DmsAccessGroups(models.Model):
     perm_unlink = fields.Boolean(string="Delete Access")
     perm_read = fields.Boolean(string="Read Access")  # ✅ New Field
 
-    # Permissions computed including parent group
+    # Permissions including the ones of the parent groups, maintained by
+    # _sync_inclusive_permissions
     perm_inclusive_create = fields.Boolean(
-        string="Inherited Create Access",
-        compute="_compute_inclusive_permissions",
-        store=True,
-        recursive=True,
+        string="Inherited Create Access", readonly=True
     )
     perm_inclusive_write = fields.Boolean(
-        string="Inherited Write Access",
-        compute="_compute_inclusive_permissions",
-        store=True,
-        recursive=True,
+        string="Inherited Write Access", readonly=True
     )
     perm_inclusive_unlink = fields.Boolean(
-        string="Inherited Unlink Access",
-        compute="_compute_inclusive_permissions",
-        store=True,
-        recursive=True,
+        string="Inherited Unlink Access", readonly=True
     )
-    perm_inclusive_read = fields.Boolean(  # ✅ New Field
-        string="Inherited Read Access",
-        compute="_compute_inclusive_permissions",
-        store=True,
-        recursive=True,
+    perm_inclusive_read = fields.Boolean(
+        string="Inherited Read Access", readonly=True
     )
 
     directory_ids = fields.Many2many(
@@ -66,7 +61,7 @@ class DmsAccessGroups(models.Model):
         auto_join=True,
         readonly=True,
     )
-    count_users = fields.Integer(compute="_compute_users", store=True)
+    count_users = fields.Integer(compute="_compute_count_users")
     count_directories = fields.Integer(compute="_compute_count_directories")
     parent_group_id = fields.Many2one(
         comodel_name="dms.access.group",
@@ -93,16 +88,15 @@ class DmsAccessGroups(models.Model):
         column2="uid",
         string="Explicit Users",
     )
+    # Users of the group and of its parents, maintained by _sync_users
     users = fields.Many2many(
         comodel_name="res.users",
         relation="dms_access_group_users_rel",
         column1="gid",
         column2="uid",
         string="Group Users",
-        compute="_compute_users",
         auto_join=True,
-        store=True,
-        recursive=True,
+        readonly=True,
     )
 
     @api.depends("directory_ids")
@@ -114,30 +108,6 @@ class DmsAccessGroups(models.Model):
         ("name_uniq", "unique (name)", "The name of the group must be unique!")
     ]
 
-    @api.depends(
-        "parent_group_id.perm_inclusive_create",
-        "parent_group_id.perm_inclusive_unlink",
-        "parent_group_id.perm_inclusive_write",
-        "parent_group_id.perm_inclusive_read",  # ✅ New Dependency
-        "parent_path",
-        "perm_create",
-        "perm_unlink",
-        "perm_write",
-        "perm_read",  # ✅ New Dependency
-    )
-    def _compute_inclusive_permissions(self):
-        """Provide full permissions inheriting from parent recursively."""
-        for one in self:
-            one.update(
-                {
-                    "perm_inclusive_%s" % perm: (
-                        one["perm_%s" % perm]
-                        or one.parent_group_id["perm_inclusive_%s" % perm]
-                    )
-                    for perm in ("create", "unlink", "write", "read")  # ✅ Include 'read'
-                }
-            )
-
     @api.model
     def default_get(self, fields_list):
         res = super().default_get(fields_list)
@@ -147,21 +117,158 @@ class DmsAccessGroups(models.Model):
             res["explicit_user_ids"] = [(6, 0, [self.env.uid])]
         return res
 
-    @api.depends(
-        "parent_group_id",
-        "parent_group_id.users",
-        "group_ids",
-        "group_ids.users",
-        "explicit_user_ids",
-    )
-    def _compute_users(self):
+    @api.depends("users")
+    def _compute_count_users(self):
         for record in self:
-            users = (
-                record.group_ids.users
-                | record.explicit_user_ids
-                | record.parent_group_id.users
+            record.count_users = len(record.users)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._sync_users()
+        records._sync_inclusive_permissions()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {"parent_group_id", "group_ids", "explicit_user_ids"} & set(vals):
+            self._sync_users()
+        permissions = {f"perm_{perm}" for perm in PERMISSIONS}
+        if {"parent_group_id", *permissions} & set(vals):
+            self._sync_inclusive_permissions()
+        return res
+
+    def _get_subtree(self):
+        """Return the ids of the groups and of their descendants, and the ids
+        of the groups they inherit from."""
+        self.flush_model(["parent_group_id", "parent_path"])
+        subtree = self.sudo().search([("id", "child_of", self.ids)])
+        ancestor_ids = {
+            int(ancestor_id)
+            for path in subtree.mapped("parent_path")
+            for ancestor_id in path.split("/")[:-1]
+        }
+        return tuple(subtree.ids), tuple(ancestor_ids)
+
+    def _sync_users(self):
+        """Update the users of the groups and of their descendants.
+
+        The users of a group are the ones of the groups along its
+        ``parent_path``: only the missing (group, user) pairs are inserted and
+        the outdated ones deleted.
+
+        :return: the number of changed rows
+        """
+        if not self:
+            return 0
+        self.flush_model(["group_ids", "explicit_user_ids"])
+        self.env["res.users"].flush_model(["groups_id"])
+        ids, ancestor_ids = self._get_subtree()
+        self.env.cr.execute(
+            """
+            WITH subtree AS (
+                SELECT id, string_to_array(rtrim(parent_path, '/'), '/')::int[]
+                    AS ancestor_ids
+                FROM dms_access_group
+                WHERE id IN %(ids)s
+            ),
+            direct AS (
+                SELECT gid, uid FROM dms_access_group_explicit_users_rel
+                WHERE gid IN %(ancestor_ids)s
+                UNION
+                SELECT groups.gid, users.uid
+                FROM dms_access_group_groups_rel AS groups
+                JOIN res_groups_users_rel AS users ON users.gid = groups.rid
+                WHERE groups.gid IN %(ancestor_ids)s
+            ),
+            expected AS (
+                SELECT DISTINCT subtree.id AS gid, direct.uid
+                FROM subtree
+                JOIN direct ON direct.gid = ANY(subtree.ancestor_ids)
+            ),
+            deleted AS (
+                DELETE FROM dms_access_group_users_rel AS rel
+                USING subtree
+                WHERE rel.gid = subtree.id
+                    AND NOT EXISTS (
+                        SELECT 1 FROM expected
+                        WHERE expected.gid = rel.gid AND expected.uid = rel.uid
+                    )
+                RETURNING rel.gid
+            ),
+            inserted AS (
+                INSERT INTO dms_access_group_users_rel (gid, uid)
+                SELECT expected.gid, expected.uid FROM expected
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM dms_access_group_users_rel AS rel
+                    WHERE rel.gid = expected.gid AND rel.uid = expected.uid
+                )
+                ON CONFLICT DO NOTHING
+                RETURNING gid
             )
-            record.update({"users": users, "count_users": len(users)})
+            SELECT count(*) FROM (
+                SELECT gid FROM deleted UNION ALL SELECT gid FROM inserted
+            ) AS changed
+            """,
+            {"ids": ids, "ancestor_ids": ancestor_ids},
+        )
+        count = self.env.cr.fetchone()[0]
+        if count:
+            self.invalidate_model(["users"])
+        _logger.debug("%s users of DMS access groups changed", count)
+        return count
+
+    def _sync_inclusive_permissions(self):
+        """Update the inclusive permissions of the groups and of their
+        descendants from the groups along their ``parent_path``.
+
+        :return: the number of changed groups
+        """
+        if not self:
+            return 0
+        self.flush_model([f"perm_{perm}" for perm in PERMISSIONS])
+        ids, _ancestor_ids = self._get_subtree()
+        self.env.cr.execute(
+            """
+            UPDATE dms_access_group AS dag
+            SET perm_inclusive_create = inclusive.perm_create,
+                perm_inclusive_write = inclusive.perm_write,
+                perm_inclusive_unlink = inclusive.perm_unlink,
+                perm_inclusive_read = inclusive.perm_read
+            FROM (
+                SELECT
+                    subtree.id,
+                    bool_or(COALESCE(ancestor.perm_create, FALSE)) AS perm_create,
+                    bool_or(COALESCE(ancestor.perm_write, FALSE)) AS perm_write,
+                    bool_or(COALESCE(ancestor.perm_unlink, FALSE)) AS perm_unlink,
+                    bool_or(COALESCE(ancestor.perm_read, FALSE)) AS perm_read
+                FROM dms_access_group AS subtree
+                JOIN dms_access_group AS ancestor
+                    ON ancestor.id = ANY(
+                        string_to_array(rtrim(subtree.parent_path, '/'), '/')::int[]
+                    )
+                WHERE subtree.id IN %s
+                GROUP BY subtree.id
+            ) AS inclusive
+            WHERE dag.id = inclusive.id
+                AND (
+                    dag.perm_inclusive_create,
+                    dag.perm_inclusive_write,
+                    dag.perm_inclusive_unlink,
+                    dag.perm_inclusive_read
+                ) IS DISTINCT FROM (
+                    inclusive.perm_create,
+                    inclusive.perm_write,
+                    inclusive.perm_unlink,
+                    inclusive.perm_read
+                )
+            """,
+            (ids,),
+        )
+        count = self.env.cr.rowcount
+        if count:
+            self.invalidate_model([f"perm_inclusive_{perm}" for perm in PERMISSIONS])
+        return count
 
     def copy(self, default=None):
         default = dict(default or {})
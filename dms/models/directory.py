@@ -8,6 +8,7 @@ import ast
 import base64
 import logging
 import os
+import time
 from ast import literal_eval
 from collections import defaultdict
 from typing import Literal  # noqa # pylint: disable=unused-import
@@ -15,15 +16,24 @@ from typing import Literal  # noqa # pylint: disable=unused-import
 from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError, ValidationError
 from odoo.osv.expression import AND, OR
-from odoo.tools import consteq, human_size
+from odoo.tools import consteq, human_size, split_every
+from odoo.tools.lru import LRU
 
 from odoo.addons.http_routing.models.ir_http import slugify
 
 from ..tools.file import check_name, unique_name
+from ..tools.tree import propagate_complete_name
 
 _logger = logging.getLogger(__name__)
 _path = os.path.dirname(os.path.dirname(__file__))
 
+# Per worker cache of the directories shared by access tokens, as
+# {(dbname, token): (expiry, directory id, parent_path)}
+ACCESS_TOKEN_CACHE = LRU(4096)
+ACCESS_TOKEN_CACHE_TTL = 30
+# Number of records deleted at once when deleting subtrees
+UNLINK_BATCH_SIZE = 1000
+
 
 class DmsDirectory(models.Model):
     _name = "dms.directory"
@@ -47,6 +57,7 @@ class DmsDirectory(models.Model):
     _directory_field = _parent_name
 
     parent_path = fields.Char(index="btree", unaccent=False)
+    access_token = fields.Char(index="btree_not_null")
     is_root_directory = fields.Boolean(
         default=False,
         help="""Indicates if the directory is a root directory.
@@ -177,19 +188,20 @@ class DmsDirectory(models.Model):
 
     count_elements = fields.Integer(compute="_compute_count_elements")
 
+    # Totals of the subtrees, maintained by _update_totals
     count_total_directories = fields.Integer(
-        compute="_compute_count_total_directories", string="Total Subdirectories"
+        string="Total Subdirectories", readonly=True, copy=False, default=0
     )
 
     count_total_files = fields.Integer(
-        compute="_compute_count_total_files", string="Total Files"
+        string="Total Files", readonly=True, copy=False, default=0
     )
 
     count_total_elements = fields.Integer(
         compute="_compute_count_total_elements", string="Total Elements"
     )
 
-    size = fields.Float(compute="_compute_size")
+    size = fields.Float(readonly=True, copy=False, default=0)
     human_size = fields.Char(
         compute="_compute_human_size", string="Size (human readable)"
     )
@@ -241,28 +253,33 @@ class DmsDirectory(models.Model):
         return res
 
     def check_access_token(self, access_token=False):
-        res = False
-        if access_token:
-            items = (
-                self.env["dms.directory"]
-                .sudo()
-                .search([("access_token", "=", access_token)])
-            )
-            if items:
-                item = items[0]
-                if item.id == self.id:
-                    return True
-                # sudo because the user might not usually have access to the record but
-                # now the token is valid.
-                directory_item = self.sudo()
-                while directory_item.parent_id:
-                    if directory_item.id == item.id:
-                        return True
-                    directory_item = directory_item.parent_id
-                # Fix last level
-                if directory_item.id == item.id:
-                    return True
-        return res
+        """Check the token shares the directory, itself or one of its parents."""
+        if not access_token:
+            return False
+        token_path = self._get_access_token_path(access_token)
+        # sudo because the user might not usually have access to the record but
+        # now the token is valid.
+        return bool(token_path) and (self.sudo().parent_path or "").startswith(
+            token_path
+        )
+
+    @api.model
+    def _get_access_token_path(self, access_token):
+        """Return the ``parent_path`` of the directory shared by a token, the
+        ones of its subdirectories starting with it."""
+        key = (self.env.cr.dbname, access_token)
+        cached = ACCESS_TOKEN_CACHE.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        self.flush_model(["access_token", "parent_path"])
+        self.env.cr.execute(
+            "SELECT parent_path FROM dms_directory WHERE access_token = %s LIMIT 1",
+            (access_token,),
+        )
+        row = self.env.cr.fetchone()
+        path = row and row[0]
+        ACCESS_TOKEN_CACHE[key] = (time.monotonic() + ACCESS_TOKEN_CACHE_TTL, path)
+        return path
 
     @api.model
     def _get_parent_categories(self, access_token):
@@ -459,41 +476,122 @@ class DmsDirectory(models.Model):
         for record in self:
             record.count_elements = record.count_files + record.count_directories
 
-    def _compute_count_total_directories(self):
-        for record in self:
-            count = (
-                self.search_count([("id", "child_of", record.id)]) if record.id else 0
-            )
-            record.count_total_directories = count - 1 if count > 0 else 0
-
-    def _compute_count_total_files(self):
-        model = self.env["dms.file"]
-        for record in self:
-            # Prevent error in some NewId cases
-            record.count_total_files = (
-                model.search_count([("directory_id", "child_of", record.id)])
-                if record.id
-                else 0
-            )
-
+    @api.depends("count_total_files", "count_total_directories")
     def _compute_count_total_elements(self):
         for record in self:
             record.count_total_elements = (
                 record.count_total_files + record.count_total_directories
             )
 
-    def _compute_size(self):
-        sudo_model = self.env["dms.file"].sudo()
-        for record in self:
-            # Avoid NewId
-            if not record.id:
-                record.size = 0
-                continue
-            recs = sudo_model.search_read(
-                domain=[("directory_id", "child_of", record.id)],
-                fields=["size"],
+    @api.model
+    def _update_totals(self, changes):
+        """Add deltas to the totals of directories and of all their ancestors,
+        in a single update along their ``parent_path``.
+
+        :param list changes: ``(directory id, directories, files, size)`` deltas
+        """
+        changes = [change for change in changes if change[0] and any(change[1:])]
+        if not changes:
+            return
+        self.flush_model(["parent_path"])
+        directory_ids, directories, files, sizes = zip(*changes)
+        self.env.cr.execute(
+            """
+            WITH delta AS (
+                SELECT
+                    ancestor.id,
+                    sum(change.directories) AS directories,
+                    sum(change.files) AS files,
+                    sum(change.size) AS size
+                FROM unnest(%s::int[], %s::int[], %s::int[], %s::float8[])
+                    AS change (directory_id, directories, files, size)
+                JOIN dms_directory AS source ON source.id = change.directory_id
+                CROSS JOIN LATERAL unnest(
+                    string_to_array(rtrim(source.parent_path, '/'), '/')::int[]
+                ) AS ancestor (id)
+                GROUP BY ancestor.id
+            ),
+            -- Lock the ancestors in a consistent order among transactions
+            locked AS (
+                SELECT directory.id
+                FROM dms_directory AS directory
+                JOIN delta ON delta.id = directory.id
+                ORDER BY directory.id
+                FOR UPDATE OF directory
             )
-            record.size = sum(rec.get("size", 0) for rec in recs)
+            UPDATE dms_directory AS directory
+            SET count_total_directories =
+                    directory.count_total_directories + delta.directories,
+                count_total_files = directory.count_total_files + delta.files,
+                size = directory.size + delta.size
+            FROM delta
+            JOIN locked ON locked.id = delta.id
+            WHERE directory.id = delta.id
+            """,
+            (list(directory_ids), list(directories), list(files), list(sizes)),
+        )
+        self.invalidate_model(["count_total_directories", "count_total_files", "size"])
+
+    @api.model
+    def _repair_totals(self):
+        """Compute the totals of all the directories again in bulk.
+
+        :return: the number of repaired directories
+        """
+        self.env.flush_all()
+        self.env.cr.execute(
+            """
+            WITH file_totals AS (
+                SELECT ancestor.id, count(*) AS files, sum(file.size) AS size
+                FROM dms_file AS file
+                JOIN dms_directory AS directory
+                    ON directory.id = file.directory_id
+                CROSS JOIN LATERAL unnest(
+                    string_to_array(rtrim(directory.parent_path, '/'), '/')::int[]
+                ) AS ancestor (id)
+                WHERE file.active
+                GROUP BY ancestor.id
+            ),
+            directory_totals AS (
+                SELECT ancestor.id, count(*) - 1 AS directories
+                FROM dms_directory AS directory
+                CROSS JOIN LATERAL unnest(
+                    string_to_array(rtrim(directory.parent_path, '/'), '/')::int[]
+                ) AS ancestor (id)
+                GROUP BY ancestor.id
+            ),
+            totals AS (
+                SELECT
+                    directory.id,
+                    COALESCE(directory_totals.directories, 0) AS directories,
+                    COALESCE(file_totals.files, 0) AS files,
+                    COALESCE(file_totals.size, 0) AS size
+                FROM dms_directory AS directory
+                LEFT JOIN directory_totals ON directory_totals.id = directory.id
+                LEFT JOIN file_totals ON file_totals.id = directory.id
+            )
+            UPDATE dms_directory AS directory
+            SET count_total_directories = totals.directories,
+                count_total_files = totals.files,
+                size = totals.size
+            FROM totals
+            WHERE directory.id = totals.id
+                AND (
+                    directory.count_total_directories,
+                    directory.count_total_files,
+                    directory.size
+                ) IS DISTINCT FROM (totals.directories, totals.files, totals.size)
+            """
+        )
+        count = self.env.cr.rowcount
+        if count:
+            _logger.warning("Repaired the totals of %s DMS directories", count)
+        self.invalidate_model(["count_total_directories", "count_total_files", "size"])
+        return count
+
+    @api.model
+    def _cron_repair_totals(self):
+        self.sudo()._repair_totals()
 
     @api.depends("size")
     def _compute_human_size(self):
@@ -512,7 +610,7 @@ class DmsDirectory(models.Model):
             groups = one.group_ids
             if one.inherit_group_ids:
                 groups |= one.parent_id.complete_group_ids
-            self.complete_group_ids = groups
+            one.complete_group_ids = groups
 
     # View
     @api.depends("is_root_directory")
@@ -697,37 +795,210 @@ class DmsDirectory(models.Model):
         ctx.update({"default_parent_id": False})
         self.env.registry.clear_cache()
         res = super(DmsDirectory, self.with_context(**ctx)).create(vals_list)
+        self._update_totals(
+            [(directory.parent_id.id, 1, 0, 0) for directory in res.sudo()]
+        )
         return res
 
+    def _subtract_moved_totals(self):
+        """Subtract the subtrees of the directories about to be moved from
+        the totals of their ancestors, and return the moved totals by id.
+
+        The deepest directories are subtracted first, so that the totals of a
+        moved directory exclude its descendants moved along with it.
+        """
+        moved = {}
+        directories = self.sudo()
+        for depth in sorted(
+            {directory.parent_path.count("/") for directory in directories},
+            reverse=True,
+        ):
+            level = directories.filtered(
+                lambda directory, depth=depth: directory.parent_path.count("/")
+                == depth
+            )
+            for directory in level:
+                moved[directory.id] = (
+                    1 + directory.count_total_directories,
+                    directory.count_total_files,
+                    directory.size,
+                )
+            self._update_totals(
+                [
+                    (directory.parent_id.id, *(-total for total in moved[directory.id]))
+                    for directory in level
+                ]
+            )
+        return moved
+
+    def _check_move(self, vals):
+        """Check in one pass that all the directories can be moved to their
+        new parent or storage, the parent being read once.
+        """
+        directories = self.sudo()
+        parent = self.browse(vals.get("parent_id")).sudo()
+        if parent and any(
+            parent.parent_path.startswith(directory.parent_path)
+            for directory in directories
+        ):
+            raise ValidationError(_("Error! You cannot create recursive directories."))
+        for directory in directories:
+            old_storage = directory.storage_id or directory.root_directory_id.storage_id
+            new_parent = parent if "parent_id" in vals else directory.parent_id
+            if new_parent:
+                if old_storage != new_parent.storage_id:
+                    raise UserError(
+                        _(
+                            "It is not possible to change to a parent "
+                            "with other storage."
+                        )
+                    )
+            elif old_storage.id != vals.get("storage_id", directory.storage_id.id):
+                raise UserError(_("It is not possible to change the storage."))
+
+    def _move_subtrees(self, old_parents):
+        """Update the subtrees of moved directories after their new parent is
+        written, the ORM having rewritten their ``parent_path`` already.
+
+        The root directory of the whole subtrees is set from their
+        ``parent_path`` in a single statement, and one message is posted on
+        each moved directory.
+        """
+        field = self._fields["root_directory_id"]
+        directories = self.sudo()
+        directories.flush_model(["parent_id", "parent_path"])
+        subtrees = directories.search([("id", "child_of", self.ids)], order="id")
+        self.env.remove_to_compute(field, subtrees)
+        self.env.cr.execute(
+            """
+            UPDATE dms_directory
+            SET root_directory_id = split_part(parent_path, '/', 1)::int
+            WHERE id IN %s
+                AND root_directory_id IS DISTINCT FROM
+                    split_part(parent_path, '/', 1)::int
+            """,
+            (tuple(subtrees.ids),),
+        )
+        self.invalidate_model(["root_directory_id"])
+        if self.env.context.get("tracking_disable"):
+            return
+        for directory in directories:
+            old_parent = old_parents.get(directory.id)
+            if old_parent != directory.parent_id:
+                directory.message_post(
+                    body=_(
+                        "Moved from %(old)s to %(new)s",
+                        old=old_parent.complete_name or "/",
+                        new=directory.parent_id.complete_name or "/",
+                    )
+                )
+
     def write(self, vals):
         if any(k in vals.keys() for k in ["storage_id", "parent_id"]):
-            for item in self:
-                new_storage_id = vals.get("storage_id", item.storage_id.id)
-                new_parent_id = vals.get("parent_id", item.parent_id.id)
-                old_storage_id = (
-                    item.storage_id or item.root_directory_id.storage_id
-                ).id
-                if new_parent_id:
-                    if old_storage_id != self.browse(new_parent_id).storage_id.id:
-                        raise UserError(
-                            _(
-                                "It is not possible to change to a parent "
-                                "with other storage."
-                            )
-                        )
-                elif old_storage_id != new_storage_id:
-                    raise UserError(_("It is not possible to change the storage."))
+            self._check_move(vals)
+        if "access_token" in vals or "parent_id" in vals:
+            ACCESS_TOKEN_CACHE.clear()
+        if "parent_id" in vals:
+            old_parents = {record.id: record.parent_id for record in self.sudo()}
+            moved = self._subtract_moved_totals()
+        rename = "name" in vals or "parent_id" in vals
+        if rename:
+            old_names = {record.id: record.complete_name for record in self.sudo()}
+        res = super().write(vals)
+        if rename:
+            propagate_complete_name(self, old_names)
+        if "parent_id" in vals:
+            self._move_subtrees(old_parents)
+            self._update_totals(
+                [
+                    (directory.parent_id.id, *moved[directory.id])
+                    for directory in self.sudo()
+                ]
+            )
         # Groups part
-        if any(key in vals for key in ["group_ids", "inherit_group_ids"]):
-            res = super().write(vals)
-            domain = [("id", "child_of", self.ids)]
-            records = self.sudo().search(domain)
-            records.modified(["group_ids"])
-            records.flush_recordset()
-        else:
-            res = super().write(vals)
+        if any(key in vals for key in ["group_ids", "inherit_group_ids", "parent_id"]):
+            self._propagate_complete_groups()
         return res
 
+    def _propagate_complete_groups(self):
+        """Compute the complete groups of the subtrees of the directories in
+        a single query, rather than recursively one directory at a time.
+
+        The descendants not inheriting the groups are left out with their
+        subtree, as their groups are unchanged, and only the relation rows
+        which changed are deleted or inserted.
+        """
+        field = self._fields["complete_group_ids"]
+        directories = self.sudo().with_context(active_test=False)
+        directories.flush_model(
+            ["group_ids", "inherit_group_ids", "parent_id", "parent_path"]
+        )
+        # The roots of the subtrees, each directory being computed once
+        ids = set(self.ids)
+        roots = directories.filtered(
+            lambda one: not ids & {int(i) for i in one.parent_path.split("/")[:-2]}
+        )
+        self.env.remove_to_compute(
+            field, directories.search([("id", "child_of", roots.ids)], order="id")
+        )
+        directories.flush_model(["complete_group_ids"])
+        self.env.cr.execute(
+            """
+            WITH RECURSIVE tree (id, gids) AS (
+                SELECT directory.id, ARRAY(
+                    SELECT own.gid FROM dms_directory_groups_rel AS own
+                    WHERE own.aid = directory.id
+                    UNION
+                    SELECT parent.gid
+                    FROM dms_directory_complete_groups_rel AS parent
+                    WHERE directory.inherit_group_ids
+                        AND parent.aid = directory.parent_id
+                )
+                FROM dms_directory AS directory
+                WHERE directory.id IN %(ids)s
+                UNION ALL
+                SELECT child.id, ARRAY(
+                    SELECT own.gid FROM dms_directory_groups_rel AS own
+                    WHERE own.aid = child.id
+                    UNION
+                    SELECT unnest(tree.gids)
+                )
+                FROM tree
+                JOIN dms_directory AS child
+                    ON child.parent_id = tree.id AND child.inherit_group_ids
+            ),
+            new_rel AS (
+                SELECT tree.id AS aid, unnest(tree.gids) AS gid FROM tree
+            ),
+            deleted AS (
+                DELETE FROM dms_directory_complete_groups_rel AS rel
+                USING tree
+                WHERE rel.aid = tree.id
+                    AND NOT EXISTS (
+                        SELECT 1 FROM new_rel
+                        WHERE new_rel.aid = rel.aid AND new_rel.gid = rel.gid
+                    )
+                RETURNING rel.aid
+            ),
+            inserted AS (
+                INSERT INTO dms_directory_complete_groups_rel (aid, gid)
+                SELECT new_rel.aid, new_rel.gid FROM new_rel
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM dms_directory_complete_groups_rel AS rel
+                    WHERE rel.aid = new_rel.aid AND rel.gid = new_rel.gid
+                )
+                ON CONFLICT DO NOTHING
+                RETURNING aid
+            )
+            SELECT aid FROM deleted UNION SELECT aid FROM inserted
+            """,
+            {"ids": tuple(roots.ids) or (None,)},
+        )
+        changed = self.browse([row[0] for row in self.env.cr.fetchall()])
+        changed.invalidate_recordset(["complete_group_ids"])
+        self.env["dms.access.group"].invalidate_model(["complete_directory_ids"])
+        return changed
+
     @api.depends_context("directory_short_name")
     def _compute_display_name(self):
         if self.env.context.get("directory_short_name"):
@@ -740,12 +1011,50 @@ class DmsDirectory(models.Model):
         """Custom cascade unlink.
 
         Cannot rely on DB backend's cascade because subfolder and subfile unlinks
-        must check custom permissions implementation.
+        must check custom permissions implementation. The whole subtrees are
+        collected by ``parent_path`` and their access is checked at once, then
+        their files and directories are deleted in batches, the deepest
+        directories first, and the blobs of the files are released at the end.
         """
-        self.file_ids.unlink()
-        if self.child_directory_ids:
-            self.child_directory_ids.unlink()
-        return super(DmsDirectory, self.exists()).unlink()
+        directories = self.exists().sudo()
+        if not directories:
+            return True
+        subtrees = directories.search([("id", "child_of", directories.ids)], order="id")
+        files = (
+            self.env["dms.file"]
+            .sudo()
+            .with_context(active_test=False)
+            .search([("directory_id", "in", subtrees.ids)], order="id")
+        )
+        for records in (subtrees, files):
+            if records:
+                records = records.with_env(self.env)
+                records.check_access_rights("unlink")
+                records.check_access_rule("unlink")
+        # The totals of the ancestors lose the subtrees at once
+        self._update_totals(
+            [
+                (
+                    directory.parent_id.id,
+                    -1 - directory.count_total_directories,
+                    -directory.count_total_files,
+                    -directory.size,
+                )
+                for directory in directories
+                if directory.parent_id not in subtrees
+            ]
+        )
+        blobs = files.blob_id
+        files = files.with_context(dms_skip_totals=True, dms_skip_blob_gc=True)
+        for ids in split_every(UNLINK_BATCH_SIZE, files.ids):
+            files.browse(ids).unlink()
+        subtrees = subtrees.sorted(
+            lambda directory: directory.parent_path.count("/"), reverse=True
+        )
+        for ids in split_every(UNLINK_BATCH_SIZE, subtrees.ids):
+            super(DmsDirectory, subtrees.browse(ids)).unlink()
+        blobs._gc()
+        return True
 
     @api.model
     def _search_panel_domain_image(
@@ -0,0 +1,129 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import base64
+import logging
+import os
+
+import psycopg2
+
+from odoo import api, fields, models
+from odoo.tools import mute_logger
+
+_logger = logging.getLogger(__name__)
+
+
+class DmsBlob(models.Model):
+    """Physical content shared by every file with the same checksum.
+
+    Blobs are reference counted: a blob lives as long as at least one file
+    (archived or not) points at it.
+    """
+
+    _name = "dms.blob"
+    _description = "Content Blob"
+    _rec_name = "checksum"
+
+    checksum = fields.Char(string="Checksum/SHA1", required=True, readonly=True)
+    save_type = fields.Selection(
+        selection=[("database", "Database"), ("file", "Filestore")],
+        required=True,
+        readonly=True,
+    )
+    size = fields.Float(readonly=True)
+    content = fields.Binary(compute="_compute_content", prefetch=False)
+    content_binary = fields.Binary(attachment=False, prefetch=False)
+    content_file = fields.Binary(attachment=True, prefetch=False)
+    file_ids = fields.One2many(
+        comodel_name="dms.file",
+        inverse_name="blob_id",
+        string="Files",
+        context={"active_test": False},
+        readonly=True,
+    )
+    ref_count = fields.Integer(
+        string="References", compute="_compute_ref_count", store=True
+    )
+
+    _sql_constraints = [
+        (
+            "checksum_save_type_uniq",
+            "unique (checksum, save_type)",
+            "A blob with the same content already exists!",
+        )
+    ]
+
+    @api.depends("file_ids")
+    def _compute_ref_count(self):
+        for record in self:
+            record.ref_count = len(record.file_ids)
+
+    @api.depends("content_binary", "content_file")
+    def _compute_content(self):
+        bin_size = self.env.context.get("bin_size", False)
+        for record in self:
+            if record.content_file:
+                context = {"human_size": True} if bin_size else {"base64": True}
+                record.content = record.with_context(**context).content_file
+            elif record.content_binary:
+                record.content = (
+                    record.content_binary
+                    if bin_size
+                    else base64.b64encode(record.content_binary)
+                )
+            else:
+                record.content = False
+
+    @api.model
+    def _get_or_create(self, checksum, save_type, binary=None, path=None):
+        """Return the blob holding a content, storing it only if it is new.
+
+        The content is given either as ``binary`` or as the ``path`` of a file
+        on disk, which is consumed when the blob is created from it.
+        """
+        domain = [("checksum", "=", checksum), ("save_type", "=", save_type)]
+        blob = self.sudo().search(domain, limit=1)
+        if blob:
+            return blob
+        size = os.path.getsize(path) if path else len(binary)
+        vals = {"checksum": checksum, "save_type": save_type, "size": size}
+        try:
+            # Another transaction may store the same content concurrently
+            with mute_logger("odoo.sql_db"), self.env.cr.savepoint():
+                blob = self.sudo().create(vals)
+        except psycopg2.IntegrityError:
+            _logger.debug("Blob %s stored concurrently, reusing it", checksum)
+            return self.sudo().search(domain, limit=1)
+        blob._store_content(binary=binary, path=path)
+        return blob
+
+    def _store_content(self, binary=None, path=None):
+        self.ensure_one()
+        if path and self.save_type == "file":
+            self.env["ir.attachment"]._dms_create_from_path(
+                path,
+                {
+                    "name": "content_file",
+                    "res_model": self._name,
+                    "res_id": self.id,
+                    "res_field": "content_file",
+                },
+                checksum=self.checksum,
+            )
+            self.invalidate_recordset(["content_file"])
+            return
+        if path:
+            with open(path, "rb") as stream:
+                binary = stream.read()
+            os.unlink(path)
+        if self.save_type == "file":
+            self.content_file = base64.b64encode(binary)
+        else:
+            self.content_binary = binary
+
+    def _gc(self):
+        """Free the blobs that are not referenced by any file anymore."""
+        orphans = self.sudo().exists().filtered(lambda blob: not blob.ref_count)
+        if orphans:
+            _logger.debug("Freeing %s unreferenced DMS blobs", len(orphans))
+            orphans.unlink()
+        return orphans
@@ -8,6 +8,8 @@ import logging
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
 
+from ..tools.tree import propagate_complete_name
+
 _logger = logging.getLogger(__name__)
 
 
@@ -77,6 +79,15 @@ class DMSCategory(models.Model):
             else:
                 category.complete_name = category.name
 
+    def write(self, vals):
+        rename = "name" in vals or "parent_id" in vals
+        if rename:
+            old_names = {record.id: record.complete_name for record in self.sudo()}
+        res = super().write(vals)
+        if rename:
+            propagate_complete_name(self, old_names)
+        return res
+
     @api.depends("child_category_ids")
     def _compute_count_categories(self):
         for record in self:
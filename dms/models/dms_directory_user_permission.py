@@ -0,0 +1,191 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from odoo import fields, models
+
+
+class DmsDirectoryUserPermission(models.Model):
+    """Permissions of each user on each directory through the access groups.
+
+    The table materializes the join of the complete groups of the directories
+    with the users and the inherited permissions of the groups. It is kept up
+    to date by triggers on those tables, the rows of the (user, directory)
+    pairs affected by a change being computed again.
+    """
+
+    _name = "dms.directory.user.permission"
+    _description = "Directory Permission of a User"
+    _auto = False
+    _log_access = False
+    _table = "dms_directory_user_permission"
+    _rec_name = "directory_id"
+
+    user_id = fields.Many2one(comodel_name="res.users", string="User", readonly=True)
+    directory_id = fields.Many2one(
+        comodel_name="dms.directory", string="Directory", readonly=True
+    )
+    perm_create = fields.Boolean(string="Create Access", readonly=True)
+    perm_write = fields.Boolean(string="Write Access", readonly=True)
+    perm_unlink = fields.Boolean(string="Delete Access", readonly=True)
+
+    def init(self):
+        cr = self.env.cr
+        cr.execute(
+            "SELECT 1 FROM information_schema.tables WHERE table_name = %s",
+            (self._table,),
+        )
+        created = not cr.rowcount
+        cr.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dms_directory_user_permission (
+                id serial PRIMARY KEY,
+                user_id integer NOT NULL
+                    REFERENCES res_users (id) ON DELETE CASCADE,
+                directory_id integer NOT NULL
+                    REFERENCES dms_directory (id) ON DELETE CASCADE,
+                perm_create boolean NOT NULL,
+                perm_write boolean NOT NULL,
+                perm_unlink boolean NOT NULL,
+                UNIQUE (user_id, directory_id)
+            );
+            CREATE INDEX IF NOT EXISTS dms_directory_user_permission_directory_idx
+                ON dms_directory_user_permission (directory_id);
+
+            -- Compute again the rows of the (user, directory) pairs given
+            CREATE OR REPLACE FUNCTION dms_refresh_directory_user_permission(
+                user_ids integer[], directory_ids integer[]
+            ) RETURNS void AS $$
+            BEGIN
+                DELETE FROM dms_directory_user_permission AS perm
+                USING unnest(user_ids, directory_ids) AS pair(uid, aid)
+                WHERE perm.user_id = pair.uid AND perm.directory_id = pair.aid;
+                INSERT INTO dms_directory_user_permission
+                    (user_id, directory_id, perm_create, perm_write, perm_unlink)
+                SELECT
+                    users.uid,
+                    rel.aid,
+                    bool_or(COALESCE(dag.perm_inclusive_create, FALSE)),
+                    bool_or(COALESCE(dag.perm_inclusive_write, FALSE)),
+                    bool_or(COALESCE(dag.perm_inclusive_unlink, FALSE))
+                FROM (
+                    SELECT DISTINCT uid, aid
+                    FROM unnest(user_ids, directory_ids) AS pair(uid, aid)
+                ) AS pair
+                JOIN dms_directory_complete_groups_rel AS rel
+                    ON rel.aid = pair.aid
+                JOIN dms_access_group_users_rel AS users
+                    ON users.gid = rel.gid AND users.uid = pair.uid
+                JOIN dms_access_group AS dag ON dag.id = rel.gid
+                GROUP BY users.uid, rel.aid;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            -- Groups added to or removed from directories
+            CREATE OR REPLACE FUNCTION dms_directory_groups_changed()
+            RETURNS trigger AS $$
+            BEGIN
+                PERFORM dms_refresh_directory_user_permission(
+                    array_agg(users.uid), array_agg(changed.aid)
+                )
+                FROM changed
+                JOIN dms_access_group_users_rel AS users
+                    ON users.gid = changed.gid;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            -- Users added to or removed from groups
+            CREATE OR REPLACE FUNCTION dms_access_group_users_changed()
+            RETURNS trigger AS $$
+            BEGIN
+                PERFORM dms_refresh_directory_user_permission(
+                    array_agg(changed.uid), array_agg(rel.aid)
+                )
+                FROM changed
+                JOIN dms_directory_complete_groups_rel AS rel
+                    ON rel.gid = changed.gid;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            -- Permissions of groups changed
+            CREATE OR REPLACE FUNCTION dms_access_group_perms_changed()
+            RETURNS trigger AS $$
+            BEGIN
+                PERFORM dms_refresh_directory_user_permission(
+                    array_agg(users.uid), array_agg(rel.aid)
+                )
+                FROM old_groups
+                JOIN new_groups ON new_groups.id = old_groups.id
+                JOIN dms_access_group_users_rel AS users
+                    ON users.gid = new_groups.id
+                JOIN dms_directory_complete_groups_rel AS rel
+                    ON rel.gid = new_groups.id
+                WHERE (
+                    old_groups.perm_inclusive_create,
+                    old_groups.perm_inclusive_write,
+                    old_groups.perm_inclusive_unlink
+                ) IS DISTINCT FROM (
+                    new_groups.perm_inclusive_create,
+                    new_groups.perm_inclusive_write,
+                    new_groups.perm_inclusive_unlink
+                );
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS dms_directory_groups_inserted
+                ON dms_directory_complete_groups_rel;
+            CREATE TRIGGER dms_directory_groups_inserted
+                AFTER INSERT ON dms_directory_complete_groups_rel
+                REFERENCING NEW TABLE AS changed
+                FOR EACH STATEMENT EXECUTE FUNCTION dms_directory_groups_changed();
+            DROP TRIGGER IF EXISTS dms_directory_groups_deleted
+                ON dms_directory_complete_groups_rel;
+            CREATE TRIGGER dms_directory_groups_deleted
+                AFTER DELETE ON dms_directory_complete_groups_rel
+                REFERENCING OLD TABLE AS changed
+                FOR EACH STATEMENT EXECUTE FUNCTION dms_directory_groups_changed();
+            DROP TRIGGER IF EXISTS dms_access_group_users_inserted
+                ON dms_access_group_users_rel;
+            CREATE TRIGGER dms_access_group_users_inserted
+                AFTER INSERT ON dms_access_group_users_rel
+                REFERENCING NEW TABLE AS changed
+                FOR EACH STATEMENT EXECUTE FUNCTION dms_access_group_users_changed();
+            DROP TRIGGER IF EXISTS dms_access_group_users_deleted
+                ON dms_access_group_users_rel;
+            CREATE TRIGGER dms_access_group_users_deleted
+                AFTER DELETE ON dms_access_group_users_rel
+                REFERENCING OLD TABLE AS changed
+                FOR EACH STATEMENT EXECUTE FUNCTION dms_access_group_users_changed();
+            DROP TRIGGER IF EXISTS dms_access_group_perms_updated
+                ON dms_access_group;
+            CREATE TRIGGER dms_access_group_perms_updated
+                AFTER UPDATE ON dms_access_group
+                REFERENCING OLD TABLE AS old_groups NEW TABLE AS new_groups
+                FOR EACH STATEMENT EXECUTE FUNCTION dms_access_group_perms_changed();
+            """
+        )
+        if created:
+            self._rebuild()
+
+    def _rebuild(self):
+        """Compute the whole table again."""
+        self.env.flush_all()
+        self.env.cr.execute(
+            """
+            DELETE FROM dms_directory_user_permission;
+            INSERT INTO dms_directory_user_permission
+                (user_id, directory_id, perm_create, perm_write, perm_unlink)
+            SELECT
+                users.uid,
+                rel.aid,
+                bool_or(COALESCE(dag.perm_inclusive_create, FALSE)),
+                bool_or(COALESCE(dag.perm_inclusive_write, FALSE)),
+                bool_or(COALESCE(dag.perm_inclusive_unlink, FALSE))
+            FROM dms_directory_complete_groups_rel AS rel
+            JOIN dms_access_group_users_rel AS users ON users.gid = rel.gid
+            JOIN dms_access_group AS dag ON dag.id = rel.gid
+            GROUP BY users.uid, rel.aid
+            """
+        )
+        self.invalidate_model()
@@ -6,8 +6,10 @@
 
 import base64
 import hashlib
+import io
 import json
 import logging
+import os
 from collections import defaultdict
 
 from PIL import Image
@@ -16,12 +18,14 @@ from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError, ValidationError
 from odoo.osv import expression
 from odoo.tools import consteq, human_size
-from odoo.tools.mimetypes import guess_mimetype
 
-from ..tools import file
+from ..tools import compression, file, sniff
 
 _logger = logging.getLogger(__name__)
 
+# Size of the slices read from the database when streaming `content_binary`
+CONTENT_CHUNK_SIZE = 1024 * 1024
+
 
 class DMSFile(models.Model):
     _name = "dms.file"
@@ -142,6 +146,10 @@ class DMSFile(models.Model):
     checksum = fields.Char(string="Checksum/SHA1", readonly=True, index="btree")
 
     content_binary = fields.Binary(attachment=False, prefetch=False)
+    content_compression = fields.Char(
+        readonly=True,
+        help="Algorithm the content saved in the database is compressed with.",
+    )
 
     save_type = fields.Char(
         compute="_compute_save_type",
@@ -161,24 +169,72 @@ class DMSFile(models.Model):
         compute="_compute_migration", store=True, compute_sudo=True
     )
     content_file = fields.Binary(attachment=True, prefetch=False)
+    blob_id = fields.Many2one(
+        comodel_name="dms.blob",
+        string="Content Blob",
+        ondelete="restrict",
+        readonly=True,
+        prefetch=False,
+        index="btree_not_null",
+    )
+
+    pack_segment_id = fields.Many2one(
+        comodel_name="dms.pack.segment",
+        string="Pack Segment",
+        ondelete="restrict",
+        readonly=True,
+        prefetch=False,
+        index="btree_not_null",
+    )
+    pack_offset = fields.Integer(readonly=True, prefetch=False)
+    pack_length = fields.Integer(readonly=True, prefetch=False)
+
+    version_ids = fields.One2many(
+        comodel_name="dms.file.version",
+        inverse_name="file_id",
+        string="Versions",
+        readonly=True,
+    )
+    version_count = fields.Integer(
+        compute="_compute_version_sizes", string="Number of Versions"
+    )
+    version_size = fields.Integer(
+        compute="_compute_version_sizes",
+        string="Versions Size",
+        help="Size taken by the previous versions of the file in bytes.",
+    )
+    version_saved_size = fields.Integer(
+        compute="_compute_version_sizes",
+        string="Saved Size",
+        help="Size saved by storing the previous versions as deltas in bytes.",
+    )
 
     # Extend inherited field(s)
-    image_1920 = fields.Image(compute="_compute_image_1920", store=True, readonly=False)
-
-    @api.depends("mimetype", "content")
-    def _compute_image_1920(self):
-        """Provide thumbnail automatically if possible."""
-        for one in self.filtered("mimetype"):
-            # Image.MIME provides a dict of mimetypes supported by Pillow,
-            # SVG is not present in the dict but is also a supported image format
-            # lacking a better solution, it's being added manually
-            # Some component modifies the PIL dictionary by adding PDF as a valid
-            # image type, so it must be explicitly excluded.
-            if one.mimetype != "application/pdf" and one.mimetype in (
-                *Image.MIME.values(),
-                "image/svg+xml",
-            ):
-                one.image_1920 = one.content
+    # Generated from the content by dms.thumbnail.queue
+    image_1920 = fields.Image()
+
+    @api.depends("checksum", "image_128", "extension")
+    def _compute_icon_url(self):
+        return super()._compute_icon_url()
+
+    def _queue_thumbnails(self, clear=True):
+        """Queue the generation of the thumbnails from the new contents of the
+        files, the extension icon being shown until they are ready."""
+        if clear:
+            self.sudo().write({"image_1920": False})
+        self.env["dms.thumbnail.queue"]._enqueue(self._has_thumbnail())
+
+    def _has_thumbnail(self):
+        """Return the files whose content is an image a thumbnail is made of."""
+        # Image.MIME provides a dict of mimetypes supported by Pillow,
+        # SVG is not present in the dict but is also a supported image format
+        # lacking a better solution, it's being added manually
+        # Some component modifies the PIL dictionary by adding PDF as a valid
+        # image type, so it must be explicitly excluded.
+        return self.filtered(
+            lambda one: one.mimetype != "application/pdf"
+            and one.mimetype in (*Image.MIME.values(), "image/svg+xml")
+        )
 
     def check_access_rule(self, operation):
         self.mapped("directory_id").check_access_rule(operation)
@@ -197,24 +253,7 @@ class DMSFile(models.Model):
         if self.access_token and consteq(self.access_token, access_token):
             return True
 
-        items = (
-            self.env["dms.directory"]
-            .sudo()
-            .search([("access_token", "=", access_token)])
-        )
-        if items:
-            item = items[0]
-            if self.directory_id.id == item.id:
-                return True
-            directory_item = self.directory_id
-            while directory_item.parent_id:
-                if directory_item.id == self.directory_id.id:
-                    return True
-                directory_item = directory_item.parent_id
-            # Fix last level
-            if directory_item.id == self.directory_id.id:
-                return True
-        return False
+        return self.sudo().directory_id.check_access_token(access_token)
 
     res_model = fields.Char(
         string="Linked attachments model", related="directory_id.res_model"
@@ -238,9 +277,230 @@ class DMSFile(models.Model):
     def _get_checksum(self, binary):
         return hashlib.sha1(binary or b"").hexdigest()
 
+    def _get_content_attachment(self):
+        """Return the attachment holding the content of the file, if any.
+
+        Filestore content lives in the attachment of the ``content_file`` field,
+        attachment storage content in the linked ``attachment_id``.
+        """
+        self.ensure_one()
+        record = self._get_content_record()
+        attachment = (
+            self.env["ir.attachment"]
+            .sudo()
+            .search(
+                [
+                    ("res_model", "=", record._name),
+                    ("res_id", "=", record.id),
+                    ("res_field", "=", "content_file"),
+                ],
+                limit=1,
+            )
+        )
+        return attachment or self.sudo().attachment_id
+
+    def _get_content_record(self):
+        """Return the record whose content fields hold the bytes of the file."""
+        self.ensure_one()
+        return self.sudo().blob_id or self
+
+    def _get_content_binary_size(self):
+        """Return the length in bytes of the content saved in the database."""
+        self.ensure_one()
+        if self.pack_segment_id:
+            return self.pack_length
+        if self.content_compression:
+            return int(self.size)
+        return self._get_content_binary_octet_length()
+
+    def _get_content_binary_octet_length(self):
+        """Return the length in bytes of the ``content_binary`` column."""
+        self.ensure_one()
+        record = self._get_content_record()
+        record.flush_recordset(["content_binary"])
+        self.env.cr.execute(
+            f"SELECT octet_length(content_binary) FROM {record._table} WHERE id = %s",
+            (record.id,),
+        )
+        row = self.env.cr.fetchone()
+        return row and row[0] or 0
+
+    def _iter_content_binary(self, start=0, stop=None, chunk_size=CONTENT_CHUNK_SIZE):
+        """Yield the bytes of the content saved in the database between
+        ``start`` and ``stop``.
+
+        Compressed contents are decompressed on the fly, so only a chunk at a
+        time is ever held in memory.
+        """
+        self.ensure_one()
+        if self.pack_segment_id:
+            stop = self.pack_length if stop is None else stop
+            yield self.sudo().pack_segment_id._read(
+                self.pack_offset + start, max(stop - start, 0)
+            )
+            return
+        if not self.content_compression:
+            yield from self._iter_content_binary_raw(start, stop, chunk_size)
+            return
+        chunks = compression.iter_decompress(
+            self._iter_content_binary_raw(chunk_size=chunk_size),
+            self.content_compression,
+        )
+        offset = 0
+        for chunk in chunks:
+            if stop is not None and offset >= stop:
+                return
+            end = offset + len(chunk)
+            if end > start:
+                chunk_stop = None if stop is None else stop - offset
+                yield chunk[max(start - offset, 0) : chunk_stop]
+            offset = end
+
+    def _iter_content_binary_raw(
+        self, start=0, stop=None, chunk_size=CONTENT_CHUNK_SIZE
+    ):
+        """Yield the bytes of ``content_binary`` between ``start`` and ``stop``.
+
+        The column is sliced by PostgreSQL, so only one chunk at a time is ever
+        held in memory.
+        """
+        self.ensure_one()
+        if stop is None:
+            stop = self._get_content_binary_octet_length()
+        record = self._get_content_record()
+        offset = start
+        while offset < stop:
+            self.env.cr.execute(
+                f"""
+                SELECT substring(content_binary FROM %s FOR %s)
+                FROM {record._table}
+                WHERE id = %s
+                """,
+                (offset + 1, min(chunk_size, stop - offset), record.id),
+            )
+            row = self.env.cr.fetchone()
+            chunk = row and row[0]
+            if not chunk:
+                return
+            yield bytes(chunk)
+            offset += len(chunk)
+
+    def open_content(self):
+        """Return a read-only binary stream over the content of the file.
+
+        Filestore contents are opened in place and database contents are read
+        from their buffer, so the content is never encoded in base64. The
+        caller is responsible for closing the stream.
+        """
+        self.ensure_one()
+        if not self.id:
+            # Onchange records only hold the content sent by the client
+            return io.BytesIO(base64.b64decode(self.content or b""))
+        if self.pack_segment_id:
+            return io.BytesIO(
+                self.sudo().pack_segment_id._read(self.pack_offset, self.pack_length)
+            )
+        attachment = self._get_content_attachment()
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), "rb")
+        if attachment:
+            return io.BytesIO(attachment.raw or b"")
+        binary = self._get_content_record().content_binary or b""
+        if self.content_compression:
+            binary = compression.decompress(binary, self.content_compression)
+        return io.BytesIO(binary)
+
+    def _read_content_headers(self, size=sniff.HEADER_SIZE):
+        """Return the first ``size`` bytes of the content of the files by id.
+
+        Only the start of the contents is read, with a single query for all the
+        contents saved in the database.
+        """
+        headers = {}
+        database = defaultdict(list)
+        for record in self:
+            if not record.id:
+                # Only decode the start of the content sent by the client
+                encoded = record.content or b""
+                header = base64.b64decode(encoded[: (size + 2) // 3 * 4])
+                headers[record.id] = header[:size]
+            elif record.pack_segment_id:
+                headers[record.id] = record.sudo().pack_segment_id._read(
+                    record.pack_offset, min(record.pack_length, size)
+                )
+            elif record.content_compression:
+                headers[record.id] = b"".join(record._iter_content_binary(0, size))
+            else:
+                attachment = record._get_content_attachment()
+                if attachment.store_fname:
+                    path = attachment._full_path(attachment.store_fname)
+                    with open(path, "rb") as stream:
+                        headers[record.id] = stream.read(size)
+                elif attachment:
+                    headers[record.id] = (attachment.raw or b"")[:size]
+                else:
+                    content_record = record._get_content_record()
+                    database[content_record._name].append(
+                        (content_record.id, record.id)
+                    )
+        for model, pairs in database.items():
+            content_records = (
+                self.env[model]
+                .sudo()
+                .browse({content_id for content_id, _file_id in pairs})
+            )
+            content_records.flush_recordset(["content_binary"])
+            self.env.cr.execute(
+                f"""
+                SELECT id, substring(content_binary FROM 1 FOR %s)
+                FROM {content_records._table}
+                WHERE id IN %s
+                """,
+                (size, tuple(content_records.ids)),
+            )
+            content_headers = dict(self.env.cr.fetchall())
+            for content_id, file_id in pairs:
+                headers[file_id] = bytes(content_headers.get(content_id) or b"")
+        return headers
+
+    @api.model
+    def _get_magic_numbers(self):
+        """Return the ``(offset, signature, mimetype)`` entries checked first to
+        detect the mimetype of a content, to be extended for domain formats."""
+        return list(sniff.MAGIC_NUMBERS)
+
+    def _iter_content(self, chunk_size=CONTENT_CHUNK_SIZE):
+        """Yield the raw content of the file in chunks, whatever its backend."""
+        with self.open_content() as stream:
+            yield from iter(lambda: stream.read(chunk_size), b"")
+
     @api.model
     def _get_content_inital_vals(self):
-        return {"content_binary": False, "content_file": False}
+        return {
+            "content_binary": False,
+            "content_compression": False,
+            "content_file": False,
+            "blob_id": False,
+            "pack_segment_id": False,
+            "pack_offset": 0,
+            "pack_length": 0,
+        }
+
+    def _get_content_binary_vals(self, binary):
+        """Return the values saving ``binary`` in the database, compressed if
+        the storage policy asks for it."""
+        storage = self.storage_id
+        mimetype = sniff.guess_mimetype_header(
+            (binary or b"")[: sniff.HEADER_SIZE], self._get_magic_numbers()
+        )
+        algorithm = storage._get_compression(mimetype, binary)
+        if algorithm:
+            compressed = compression.compress(
+                binary, algorithm, storage.compression_level
+            )
+            if len(compressed) < len(binary):
+                return {"content_binary": compressed, "content_compression": algorithm}
+        return {"content_binary": binary or False}
 
     def _update_content_vals(self, vals, binary):
         new_vals = vals.copy()
@@ -250,12 +510,33 @@ class DMSFile(models.Model):
                 "size": binary and len(binary) or 0,
             }
         )
-        if self.storage_id.save_type in ["file", "attachment"]:
+        storage = self.storage_id
+        if binary and storage.deduplicate_content:
+            save_type = "database" if storage.save_type == "database" else "file"
+            new_vals["blob_id"] = (
+                self.env["dms.blob"]
+                ._get_or_create(new_vals["checksum"], save_type, binary=binary)
+                .id
+            )
+        elif binary and storage._is_packed(len(binary)):
+            new_vals.update(self._get_content_pack_vals(binary))
+        elif storage.save_type in ["file", "attachment", "pack"]:
             new_vals["content_file"] = self.content
         else:
-            new_vals["content_binary"] = self.content and binary
+            new_vals.update(self._get_content_binary_vals(self.content and binary))
         return new_vals
 
+    def _get_content_pack_vals(self, binary):
+        """Return the values saving ``binary`` in a pack segment."""
+        segment, offset = self.env["dms.pack.segment"]._append(
+            self.storage_id, binary
+        )
+        return {
+            "pack_segment_id": segment.id,
+            "pack_offset": offset,
+            "pack_length": len(binary),
+        }
+
     @api.model
     def _get_binary_max_size(self):
         return int(
@@ -273,6 +554,12 @@ class DMSFile(models.Model):
     def _get_icon_placeholder_name(self):
         return self.extension and "file_%s.svg" % self.extension or ""
 
+    def _get_thumbnail_url(self):
+        # Tied to the content, so that the thumbnail is cached until it changes
+        if not self.checksum:
+            return super()._get_thumbnail_url()
+        return f"/dms/file/{self.id}/thumbnail/{self.checksum}"
+
     # Actions
     def action_migrate(self, should_logging=True):
         record_count = len(self)
@@ -289,12 +576,8 @@ class DMSFile(models.Model):
                     )
                 )
                 index += 1
-            dms_file.write(
-                {
-                    "content": dms_file.with_context(**{}).content,
-                    "storage_id": dms_file.directory_id.storage_id.id,
-                }
-            )
+            with dms_file.open_content() as stream:
+                dms_file._write_content_from_stream(stream)
 
     def action_save_onboarding_file_step(self):
         self.env.user.company_id.set_onboarding_step_done(
@@ -462,29 +745,83 @@ class DMSFile(models.Model):
 
     @api.depends("name", "mimetype", "content")
     def _compute_extension(self):
+        unknown = self.browse()
         for record in self:
+            record.extension = file.guess_extension(record.name, record.mimetype)
+            if not record.extension:
+                unknown |= record
+        headers = unknown._read_content_headers()
+        for record in unknown:
             record.extension = file.guess_extension(
-                record.name, record.mimetype, record.content
+                record.name, record.mimetype, headers[record.id]
             )
 
     @api.depends("content")
     def _compute_mimetype(self):
+        headers = self._read_content_headers()
+        magic_numbers = self._get_magic_numbers()
         for record in self:
-            binary = base64.b64decode(record.content or "")
-            record.mimetype = guess_mimetype(binary)
+            record.mimetype = sniff.guess_mimetype_header(
+                headers[record.id], magic_numbers
+            )
+
+    @api.depends("version_ids")
+    def _compute_version_sizes(self):
+        groups = self.env["dms.file.version"]._read_group(
+            [("file_id", "in", self.ids)],
+            ["file_id"],
+            ["__count", "size:sum", "stored_size:sum"],
+        )
+        sizes = {dms_file.id: values for dms_file, *values in groups}
+        for record in self:
+            count, size, stored_size = sizes.get(record.id, (0, 0, 0))
+            record.version_count = count
+            record.version_size = stored_size
+            record.version_saved_size = size - stored_size
 
     @api.depends("size")
     def _compute_human_size(self):
         for item in self:
             item.human_size = human_size(item.size)
 
-    @api.depends("content_binary", "content_file", "attachment_id")
+    @api.depends(
+        "content_binary",
+        "content_compression",
+        "content_file",
+        "attachment_id",
+        "blob_id",
+        "pack_segment_id",
+        "pack_offset",
+    )
     def _compute_content(self):
         bin_size = self.env.context.get("bin_size", False)
         for record in self:
-            if record.content_file:
+            if record.pack_segment_id:
+                record.content = (
+                    human_size(record.pack_length)
+                    if bin_size
+                    else base64.b64encode(
+                        record.sudo().pack_segment_id._read(
+                            record.pack_offset, record.pack_length
+                        )
+                    )
+                )
+            elif record.blob_id:
+                blob = record.sudo().blob_id
+                record.content = blob.with_context(bin_size=bin_size).content
+            elif record.content_file:
                 context = {"human_size": True} if bin_size else {"base64": True}
                 record.content = record.with_context(**context).content_file
+            elif record.content_binary and record.content_compression:
+                record.content = (
+                    human_size(record.size)
+                    if bin_size
+                    else base64.b64encode(
+                        compression.decompress(
+                            record.content_binary, record.content_compression
+                        )
+                    )
+                )
             elif record.content_binary:
                 record.content = (
                     record.content_binary
@@ -495,15 +832,27 @@ class DMSFile(models.Model):
                 context = {"human_size": True} if bin_size else {"base64": True}
                 record.content = record.with_context(**context).attachment_id.datas
 
-    @api.depends("content_binary", "content_file")
+    @api.depends("content_binary", "content_file", "blob_id", "pack_segment_id")
     def _compute_save_type(self):
         for record in self:
-            if record.content_file:
+            if record.pack_segment_id:
+                record.save_type = "pack"
+            elif record.blob_id:
+                record.save_type = record.sudo().blob_id.save_type
+            elif record.content_file:
                 record.save_type = "file"
             else:
                 record.save_type = "database"
 
-    @api.depends("storage_id", "storage_id.save_type")
+    @api.depends(
+        "storage_id",
+        "storage_id.save_type",
+        "content_binary",
+        "content_file",
+        "blob_id",
+        "pack_segment_id",
+        "size",
+    )
     def _compute_migration(self):
         storage_model = self.env["dms.storage"]
         save_field = storage_model._fields["save_type"]
@@ -511,7 +860,14 @@ class DMSFile(models.Model):
         selection = {value[0]: value[1] for value in values}
         for record in self:
             storage_type = record.storage_id.save_type
-            if storage_type == "attachment" or storage_type == record.save_type:
+            if (
+                storage_type == "attachment"
+                or storage_type == record.save_type
+                # Files too large to be packed are saved in the filestore
+                or storage_type == "pack"
+                and record.save_type == "file"
+                and not record.storage_id._is_packed(record.size)
+            ):
                 record.migration = selection.get(storage_type)
                 record.require_migration = False
             else:
@@ -570,14 +926,136 @@ class DMSFile(models.Model):
 
     # Create, Update, Delete
     def _inverse_content(self):
+        old_blobs = self.sudo().blob_id
         updates = defaultdict(set)
         for record in self:
             values = self._get_content_inital_vals()
             binary = base64.b64decode(record.content or "")
+            record._keep_version(self._get_checksum(binary))
             values = record._update_content_vals(values, binary)
             updates[tools.frozendict(values)].add(record.id)
         for vals, ids in updates.items():
             self.browse(ids).write(dict(vals))
+        old_blobs._gc()
+
+    @api.model
+    def _create_from_path(self, vals, path, checksum=None):
+        """Create a file whose content is read from ``path``, which is consumed.
+
+        Filestore and attachment storages move the file in place, so its
+        content is never loaded in memory nor encoded in base64.
+        """
+        directory = self.env["dms.directory"].browse(vals["directory_id"])
+        if (
+            directory.res_model
+            and directory.res_id
+            and directory.storage_id_save_type == "attachment"
+        ):
+            checksum = checksum or file.checksum_path(path)
+            size = os.path.getsize(path)
+            attachment = self.env["ir.attachment"]._dms_create_from_path(
+                path,
+                {
+                    "name": vals["name"],
+                    "res_model": directory.res_model,
+                    "res_id": directory.res_id,
+                },
+                checksum=checksum,
+            )
+            return self.create(
+                dict(
+                    vals,
+                    attachment_id=attachment.id,
+                    res_model=directory.res_model,
+                    res_id=directory.res_id,
+                    checksum=checksum,
+                    size=size,
+                )
+            )
+        record = self.create(vals)
+        record._write_content_from_path(path, checksum=checksum)
+        return record
+
+    def _write_content_from_path(self, path, checksum=None):
+        """Replace the content with the file at ``path``, which is consumed."""
+        self.ensure_one()
+        checksum = checksum or file.checksum_path(path)
+        self._keep_version(checksum)
+        values = dict(
+            self._get_content_inital_vals(),
+            checksum=checksum,
+            size=os.path.getsize(path),
+        )
+        storage = self.storage_id
+        old_blobs = self.sudo().blob_id
+        store_in_file = False
+        if not values["size"]:
+            pass
+        elif storage.deduplicate_content:
+            save_type = "database" if storage.save_type == "database" else "file"
+            values["blob_id"] = (
+                self.env["dms.blob"]._get_or_create(checksum, save_type, path=path).id
+            )
+        elif storage._is_packed(values["size"]):
+            with open(path, "rb") as stream:
+                values.update(self._get_content_pack_vals(stream.read()))
+        elif storage.save_type in ["file", "attachment", "pack"]:
+            store_in_file = True
+        else:
+            with open(path, "rb") as stream:
+                values.update(self._get_content_binary_vals(stream.read()))
+        self.write(values)
+        if store_in_file:
+            self.env["ir.attachment"]._dms_create_from_path(
+                path,
+                {
+                    "name": "content_file",
+                    "res_model": self._name,
+                    "res_id": self.id,
+                    "res_field": "content_file",
+                },
+                checksum=checksum,
+            )
+            self.invalidate_recordset(["content_file"])
+            self.modified(["content_file"])
+        if os.path.exists(path):
+            os.unlink(path)
+        old_blobs._gc()
+
+    @api.model
+    def _get_spool_dir(self):
+        """Return the directory where contents are spooled before being moved
+        in the filestore, creating it if needed."""
+        filestore = tools.config.filestore(self.env.cr.dbname)
+        spool_dir = os.path.join(filestore, "dms_upload")
+        os.makedirs(spool_dir, exist_ok=True)
+        return spool_dir
+
+    def _write_content_from_stream(self, stream):
+        """Replace the content with the data read from a binary ``stream``.
+
+        The data is spooled to a file next to the filestore, so that it can be
+        moved in place instead of being loaded in memory.
+        """
+        self.ensure_one()
+        path, checksum = file.spool_stream(stream, self._get_spool_dir())
+        try:
+            self._write_content_from_path(path, checksum=checksum)
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def _keep_version(self, checksum):
+        """Save the current content as a version before it is replaced by a
+        content with another ``checksum``."""
+        self.ensure_one()
+        if (
+            self.storage_id.keep_versions
+            and self.checksum
+            and self.checksum != checksum
+        ):
+            with self.open_content() as stream:
+                self.env["dms.file.version"]._create_version(self, stream.read())
 
     def _create_model_attachment(self, vals):
         res_vals = vals.copy()
@@ -631,15 +1109,74 @@ class DMSFile(models.Model):
             if "attachment_id" not in vals:
                 vals = self._create_model_attachment(vals)
             new_vals_list.append(vals)
-        return super().create(new_vals_list)
+        # The content is saved by a write during the creation, counted below
+        records = (
+            super(DMSFile, self.with_context(dms_skip_totals=True))
+            .create(new_vals_list)
+            .with_env(self.env)
+        )
+        records._update_directory_totals({}, records._get_totals_state())
+        records.filtered("checksum")._queue_thumbnails(clear=False)
+        return records
+
+    def write(self, vals):
+        # Storage changes keep the checksum, and the thumbnail with it
+        changed = self.browse()
+        if "checksum" in vals:
+            changed = self.filtered(lambda one: one.checksum != vals["checksum"])
+        totals = not self.env.context.get("dms_skip_totals") and (
+            {"directory_id", "size", "active"} & set(vals)
+        )
+        if totals:
+            old_state = self._get_totals_state()
+        res = super().write(vals)
+        if totals:
+            self._update_directory_totals(old_state, self._get_totals_state())
+        if changed:
+            changed._queue_thumbnails()
+        return res
 
     def unlink(self):
         attachments = self.mapped("attachment_id")
+        blobs = self.sudo().blob_id
+        if not self.env.context.get("dms_skip_totals"):
+            self._update_directory_totals(self._get_totals_state(), {})
         res = super().unlink()
         if not self.env.context.get("dms_file"):
             attachments.with_context(dms_file=True).unlink()
+        # Released once by the deletion of whole directory subtrees
+        if not self.env.context.get("dms_skip_blob_gc"):
+            blobs._gc()
         return res
 
+    def _get_totals_state(self):
+        """Return the directory and the size by id of the files counted in
+        the totals of the directories, the active ones.
+        """
+        if not self.ids:
+            return {}
+        self.flush_recordset(["directory_id", "size", "active"])
+        self.env.cr.execute(
+            """
+            SELECT id, directory_id, size FROM dms_file
+            WHERE id IN %s AND active
+            """,
+            (tuple(self.ids),),
+        )
+        return {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+    def _update_directory_totals(self, old_state, new_state):
+        changes = []
+        for file_id in old_state.keys() | new_state.keys():
+            old, new = old_state.get(file_id), new_state.get(file_id)
+            if old == new:
+                continue
+            if old:
+                changes.append((old[0], 0, -1, -(old[1] or 0)))
+            if new:
+                changes.append((new[0], 0, 1, new[1] or 0))
+        self.env["dms.directory"]._update_totals(changes)
+
     # ----------------------------------------------------------
     # Locking fields and functions
     locked_by = fields.Many2one(comodel_name="res.users")
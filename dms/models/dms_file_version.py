@@ -0,0 +1,161 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import os
+import zlib
+
+from odoo import api, fields, models
+
+from ..tools import delta, file
+
+
+class DmsFileVersion(models.Model):
+    """Previous content of a file.
+
+    Versions are stored as deltas against the previous version, with a full
+    snapshot every few versions to bound the number of deltas applied to
+    rebuild one.
+    """
+
+    _name = "dms.file.version"
+    _description = "File Version"
+    _order = "file_id, version desc"
+
+    file_id = fields.Many2one(
+        comodel_name="dms.file",
+        string="File",
+        required=True,
+        readonly=True,
+        ondelete="cascade",
+        index="btree",
+    )
+    version = fields.Integer(required=True, readonly=True)
+    kind = fields.Selection(
+        selection=[("snapshot", "Snapshot"), ("delta", "Delta")],
+        required=True,
+        readonly=True,
+    )
+    data = fields.Binary(attachment=False, prefetch=False, readonly=True)
+    size = fields.Integer(readonly=True, help="Size of the version in bytes.")
+    stored_size = fields.Integer(
+        readonly=True, help="Size actually stored for the version in bytes."
+    )
+    checksum = fields.Char(string="Checksum/SHA1", readonly=True)
+
+    _sql_constraints = [
+        (
+            "file_version_uniq",
+            "unique (file_id, version)",
+            "A file cannot have two versions with the same number!",
+        )
+    ]
+
+    @api.depends("file_id", "version")
+    def _compute_display_name(self):
+        for record in self:
+            record.display_name = f"{record.file_id.name} (v{record.version})"
+
+    @api.model
+    def _create_version(self, dms_file, binary):
+        """Store ``binary`` as the next version of a file."""
+        last = self.sudo().search([("file_id", "=", dms_file.id)], limit=1)
+        number = last.version + 1
+        interval = max(dms_file.storage_id.version_snapshot_interval, 1)
+        kind, payload = "snapshot", binary
+        if last and (number - 1) % interval:
+            binary_delta = delta.make_delta(last._get_content(), binary)
+            if len(binary_delta) < len(binary):
+                kind, payload = "delta", binary_delta
+        data = zlib.compress(payload)
+        return self.sudo().create(
+            {
+                "file_id": dms_file.id,
+                "version": number,
+                "kind": kind,
+                "data": data,
+                "size": len(binary),
+                "stored_size": len(data),
+                "checksum": dms_file._get_checksum(binary),
+            }
+        )
+
+    def unlink(self):
+        """Rebase the deltas based on the deleted versions into snapshots,
+        which could not be rebuilt anymore otherwise."""
+        deleted = set(self.ids)
+        rebased = {}
+        for dms_file in self.sudo().file_id:
+            versions = self.sudo().search(
+                [("file_id", "=", dms_file.id)], order="version"
+            )
+            for previous, version in zip(versions, versions[1:]):
+                if (
+                    previous.id in deleted
+                    and version.id not in deleted
+                    and version.kind == "delta"
+                ):
+                    rebased[version] = version._get_content()
+        res = super().unlink()
+        for version, content in rebased.items():
+            data = zlib.compress(content)
+            version.write({"kind": "snapshot", "data": data, "stored_size": len(data)})
+        return res
+
+    def _get_payload(self):
+        self.ensure_one()
+        return zlib.decompress(self.data or b"")
+
+    def _get_chain(self):
+        """Return the snapshot and the deltas rebuilding the version."""
+        self.ensure_one()
+        versions = self.sudo().search(
+            [("file_id", "=", self.file_id.id), ("version", "<=", self.version)]
+        )
+        snapshot = versions.filtered(lambda version: version.kind == "snapshot")[:1]
+        deltas = versions.filtered(lambda version: version.version > snapshot.version)
+        return snapshot, deltas.sorted("version")
+
+    def _iter_content(self):
+        """Yield the content of the version in chunks.
+
+        The versions it is based on are rebuilt in memory, the version itself
+        is streamed from the last of them.
+        """
+        snapshot, deltas = self._get_chain()
+        content = snapshot._get_payload()
+        if not deltas:
+            yield content
+            return
+        for version in deltas[:-1]:
+            content = b"".join(delta.apply_delta(content, version._get_payload()))
+        yield from delta.apply_delta(content, deltas[-1]._get_payload())
+
+    def _get_content(self):
+        return b"".join(self._iter_content())
+
+    def _check_file_access(self, operation):
+        self.mapped("file_id").check_access_rights(operation)
+        self.mapped("file_id").check_access_rule(operation)
+
+    def action_download(self):
+        self.ensure_one()
+        self._check_file_access("read")
+        return {
+            "type": "ir.actions.act_url",
+            "url": f"/dms/file/version/{self.id}/download",
+            "target": "self",
+        }
+
+    def action_restore(self):
+        """Replace the content of the file by the one of the version."""
+        self.ensure_one()
+        self._check_file_access("write")
+        dms_file = self.file_id
+        path, checksum = file.spool_chunks(
+            self._iter_content(), dms_file._get_spool_dir()
+        )
+        try:
+            dms_file._write_content_from_path(path, checksum=checksum)
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+        return True
@@ -0,0 +1,167 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import logging
+import os
+import uuid
+
+from odoo import api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+
+class DmsPackSegment(models.Model):
+    """Append-only file of the filestore packing the contents of small files.
+
+    Contents are only ever appended to the open segment of a storage, the
+    files keeping the offset and length of their content. Space is reclaimed
+    by compacting the segments mostly made of contents no file uses anymore.
+    """
+
+    _name = "dms.pack.segment"
+    _description = "Pack Segment"
+    _order = "id"
+
+    name = fields.Char(required=True, readonly=True)
+    storage_id = fields.Many2one(
+        comodel_name="dms.storage",
+        string="Storage",
+        required=True,
+        readonly=True,
+        ondelete="restrict",
+        index="btree",
+    )
+    size = fields.Integer(readonly=True, help="Size of the segment file in bytes.")
+    live_size = fields.Integer(
+        compute="_compute_live_size",
+        help="Size of the contents still used by files in bytes.",
+    )
+    state = fields.Selection(
+        selection=[("open", "Open"), ("sealed", "Sealed")],
+        default="open",
+        required=True,
+        readonly=True,
+    )
+    file_ids = fields.One2many(
+        comodel_name="dms.file",
+        inverse_name="pack_segment_id",
+        string="Files",
+        context={"active_test": False},
+        readonly=True,
+    )
+
+    def _compute_live_size(self):
+        self.env["dms.file"].flush_model(["pack_segment_id", "pack_length"])
+        self.env.cr.execute(
+            """
+            SELECT pack_segment_id, sum(pack_length)
+            FROM dms_file
+            WHERE pack_segment_id IN %s
+            GROUP BY pack_segment_id
+            """,
+            (tuple(self.ids) or (None,),),
+        )
+        live_sizes = dict(self.env.cr.fetchall())
+        for record in self:
+            record.live_size = live_sizes.get(record.id, 0)
+
+    @api.model
+    def _get_pack_dir(self):
+        return os.path.join(tools.config.filestore(self.env.cr.dbname), "dms_pack")
+
+    def _get_path(self):
+        self.ensure_one()
+        return os.path.join(self._get_pack_dir(), self.name)
+
+    @api.model
+    def _get_open_segment(self, storage):
+        """Return the segment of a storage to append to, locked until commit."""
+        segment_size = storage.pack_segment_size * 1024 * 1024
+        segment = self.sudo().search(
+            [("storage_id", "=", storage.id), ("state", "=", "open")], limit=1
+        )
+        if segment:
+            # Appends to a segment are serialized by its row lock
+            self.env.cr.execute(
+                "SELECT id FROM dms_pack_segment WHERE id = %s FOR UPDATE",
+                (segment.id,),
+            )
+            segment.invalidate_recordset(["state", "size"])
+            if segment.state == "open" and segment.size < segment_size:
+                return segment
+            if segment.state == "open":
+                segment.state = "sealed"
+        name = os.path.join(str(storage.id), "%s.pack" % uuid.uuid4().hex)
+        segment = self.sudo().create({"name": name, "storage_id": storage.id})
+        os.makedirs(os.path.dirname(segment._get_path()), exist_ok=True)
+        return segment
+
+    @api.model
+    def _append(self, storage, binary):
+        """Append a content to the open segment of a storage.
+
+        :return: the segment and the offset of the content in it
+        """
+        segment = self._get_open_segment(storage)
+        with open(segment._get_path(), "ab") as stream:
+            # The actual end of the file: contents appended by transactions
+            # which were rolled back are left as garbage for the compaction.
+            offset = stream.seek(0, os.SEEK_END)
+            stream.write(binary)
+            stream.flush()
+            os.fsync(stream.fileno())
+        segment.size = offset + len(binary)
+        return segment, offset
+
+    def _read(self, offset, length):
+        self.ensure_one()
+        with open(self._get_path(), "rb") as stream:
+            stream.seek(offset)
+            return stream.read(length)
+
+    @api.model
+    def _cron_compact_segments(self):
+        ratio = float(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("dms.pack_compaction_ratio", default=0.5)
+        )
+        segments = self.sudo().search([("state", "=", "sealed")])
+        segments.filtered(
+            lambda segment: segment.live_size < segment.size * ratio
+        )._compact()
+
+    def _compact(self):
+        """Move the live contents of the segments to the open ones and delete
+        the segment files once committed."""
+        file_model = self.env["dms.file"].sudo().with_context(active_test=False)
+        for segment in self:
+            self.env.cr.execute(
+                "SELECT id FROM dms_pack_segment WHERE id = %s FOR UPDATE",
+                (segment.id,),
+            )
+            reclaimed = segment.size - segment.live_size
+            files = file_model.search([("pack_segment_id", "=", segment.id)])
+            moved = {}
+            for dms_file in files:
+                # Copied files share their content, which is moved only once
+                key = (dms_file.pack_offset, dms_file.pack_length)
+                if key not in moved:
+                    binary = segment._read(*key)
+                    moved[key] = self._append(segment.storage_id, binary)
+                new_segment, offset = moved[key]
+                dms_file.write(
+                    {"pack_segment_id": new_segment.id, "pack_offset": offset}
+                )
+            path = segment._get_path()
+            _logger.info(
+                "Compacted DMS pack segment %s: %s bytes reclaimed",
+                segment.id,
+                reclaimed,
+            )
+            segment.unlink()
+            self.env.cr.postcommit.add(lambda path=path: self._remove_file(path))
+
+    @api.model
+    def _remove_file(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,189 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import pprint
+import time
+
+from odoo import Command, api, fields, models
+from odoo.tools import SQL
+from odoo.tools.safe_eval import safe_eval
+
+
+class DmsPermissionExplain(models.Model):
+    """Breakdown of the permission domains of a user on files or directories.
+
+    Each branch of the domains, the access groups, the inheritance from the
+    linked records and every record rule, is timed and explained separately,
+    along with the combination of them all applied by the record rules.
+    """
+
+    _name = "dms.permission.explain"
+    _description = "Permission Explanation"
+    _order = "id desc"
+    _rec_name = "user_id"
+
+    user_id = fields.Many2one(
+        comodel_name="res.users",
+        string="User",
+        required=True,
+        default=lambda self: self.env.user,
+        ondelete="cascade",
+    )
+    model = fields.Selection(
+        selection=[("dms.file", "Files"), ("dms.directory", "Directories")],
+        required=True,
+        default="dms.file",
+    )
+    operation = fields.Selection(
+        selection=[
+            ("read", "Read"),
+            ("create", "Create"),
+            ("write", "Write"),
+            ("unlink", "Delete"),
+        ],
+        required=True,
+        default="read",
+    )
+    date = fields.Datetime(string="Explained on", readonly=True)
+    line_ids = fields.One2many(
+        comodel_name="dms.permission.explain.line",
+        inverse_name="explain_id",
+        string="Branches",
+        readonly=True,
+    )
+    duration = fields.Float(
+        string="Duration (ms)", compute="_compute_duration", store=True
+    )
+
+    @api.depends("line_ids.domain_duration", "line_ids.query_duration")
+    def _compute_duration(self):
+        for record in self:
+            record.duration = sum(
+                line.domain_duration + line.query_duration
+                for line in record.line_ids
+                if not line.is_total
+            )
+
+    def action_explain(self):
+        for record in self:
+            record.write(
+                {
+                    "line_ids": [Command.clear()]
+                    + [Command.create(vals) for vals in record._explain()],
+                    "date": fields.Datetime.now(),
+                }
+            )
+        return True
+
+    def _get_branches(self, model):
+        """Return the name and the domain builder of each branch."""
+        operation = self.operation
+        branches = [
+            (
+                "Access Groups",
+                lambda stats: model._get_domain_by_access_groups(operation),
+            ),
+            (
+                "Inheritance",
+                lambda stats: model._compute_domain_by_inheritance(
+                    operation, stats=stats
+                ),
+            ),
+        ]
+        rule_model = self.env["ir.rule"].with_user(self.user_id)
+        eval_context = rule_model._eval_context()
+        for rule in rule_model._get_rules(self.model, mode=operation).sudo():
+            branches.append(
+                (
+                    f"Rule: {rule.name}",
+                    lambda stats, rule=rule: safe_eval(
+                        rule.domain_force or "[]", eval_context
+                    ),
+                )
+            )
+        return branches
+
+    def _explain(self):
+        """Return the values of the lines explaining each branch."""
+        self.ensure_one()
+        model = self.env[self.model].with_user(self.user_id)
+        model.env.flush_all()
+        lines = []
+        for name, get_domain in self._get_branches(model):
+            stats = {}
+            start = time.perf_counter()
+            domain = get_domain(stats)
+            domain_duration = (time.perf_counter() - start) * 1000
+            # Evaluated alone, without the record rules
+            query = model.sudo()._where_calc(domain, active_test=False)
+            lines.append(
+                dict(
+                    self._explain_query(query),
+                    name=name,
+                    domain=pprint.pformat(domain),
+                    domain_duration=domain_duration,
+                    checked_records=stats.get("checked_records", 0),
+                )
+            )
+        start = time.perf_counter()
+        query = model.sudo()._where_calc([], active_test=False)
+        model._apply_ir_rules(query, self.operation)
+        domain_duration = (time.perf_counter() - start) * 1000
+        domain = self.env["ir.rule"].with_user(self.user_id)._compute_domain(
+            self.model, self.operation
+        )
+        lines.append(
+            dict(
+                self._explain_query(query),
+                name="Record Rules",
+                domain=pprint.pformat(domain),
+                domain_duration=domain_duration,
+                is_total=True,
+            )
+        )
+        for sequence, vals in enumerate(lines):
+            vals["sequence"] = sequence
+        return lines
+
+    def _explain_query(self, query):
+        cr = self.env.cr
+        select = query.select()
+        start = time.perf_counter()
+        cr.execute(SQL("SELECT COUNT(*) FROM (%s) AS explained", select))
+        record_count = cr.fetchone()[0]
+        query_duration = (time.perf_counter() - start) * 1000
+        cr.execute(SQL("EXPLAIN (ANALYZE, BUFFERS) %s", select))
+        return {
+            "query": cr.mogrify(select.code, select.params).decode(),
+            "plan": "\n".join(row[0] for row in cr.fetchall()),
+            "query_duration": query_duration,
+            "record_count": record_count,
+        }
+
+
+class DmsPermissionExplainLine(models.Model):
+    _name = "dms.permission.explain.line"
+    _description = "Permission Explanation Branch"
+    _order = "explain_id, sequence"
+
+    explain_id = fields.Many2one(
+        comodel_name="dms.permission.explain",
+        string="Explanation",
+        required=True,
+        ondelete="cascade",
+        index="btree",
+    )
+    sequence = fields.Integer()
+    name = fields.Char(string="Branch", required=True)
+    is_total = fields.Boolean(
+        string="Combined", help="Combination of the branches by the record rules."
+    )
+    domain = fields.Text()
+    query = fields.Text(string="SQL")
+    plan = fields.Text(string="Query Plan")
+    domain_duration = fields.Float(string="Domain (ms)")
+    query_duration = fields.Float(string="Query (ms)")
+    record_count = fields.Integer(string="Records")
+    checked_records = fields.Integer(
+        string="Checked Linked Records",
+        help="Records linked to DMS records checked to compute the domain.",
+    )
@@ -0,0 +1,221 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import hashlib
+import logging
+import threading
+import time
+
+from odoo import api, fields, models
+
+from ..tools import compression
+
+_logger = logging.getLogger(__name__)
+
+
+class IOBudget:
+    """Sleep as needed to keep reads under ``bytes_per_second`` (0: no limit)."""
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self.consumed = 0
+        self.started = time.monotonic()
+
+    def consume(self, size):
+        self.consumed += size
+        if not self.bytes_per_second:
+            return
+        ahead = self.consumed / self.bytes_per_second - (
+            time.monotonic() - self.started
+        )
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+class DmsScrubRun(models.Model):
+    """Execution of the integrity scrubber.
+
+    Each run re-hashes files by increasing id, starting after the last file
+    verified by the previous run, so that all files are eventually verified
+    even if a single run cannot cover them.
+    """
+
+    _name = "dms.scrub.run"
+    _description = "Integrity Scrub Run"
+    _order = "id desc"
+    _rec_name = "date_start"
+
+    date_start = fields.Datetime(
+        string="Start Date", default=fields.Datetime.now, readonly=True
+    )
+    date_end = fields.Datetime(string="End Date", readonly=True)
+    start_file_id = fields.Integer(string="Start File ID", readonly=True)
+    last_file_id = fields.Integer(
+        string="Last File ID",
+        readonly=True,
+        help="Last file verified. The next run resumes after it.",
+    )
+    is_complete = fields.Boolean(
+        string="Complete",
+        readonly=True,
+        help="The run reached the last file. The next run starts over.",
+    )
+    file_count = fields.Integer(string="Verified Files", readonly=True)
+    byte_count = fields.Float(string="Read Bytes", readonly=True)
+    issue_ids = fields.One2many(
+        comodel_name="dms.integrity.issue",
+        inverse_name="run_id",
+        string="Issues",
+        readonly=True,
+    )
+    issue_count = fields.Integer(compute="_compute_issue_count", string="Issues")
+
+    @api.depends("issue_ids")
+    def _compute_issue_count(self):
+        for record in self:
+            record.issue_count = len(record.issue_ids)
+
+    @api.model
+    def _get_scrub_params(self):
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        return {
+            "batch_size": int(get_param("dms.scrub_batch_size", default=100)),
+            "bytes_per_second": int(
+                get_param("dms.scrub_bytes_per_second", default=10 * 1024 * 1024)
+            ),
+            "max_duration": int(get_param("dms.scrub_max_duration", default=900)),
+        }
+
+    @api.model
+    def _cron_scrub(self):
+        previous = self.search([], limit=1)
+        start_id = previous.last_file_id if not previous.is_complete else 0
+        run = self.create({"start_file_id": start_id, "last_file_id": start_id})
+        run._scrub(**self._get_scrub_params())
+        return run
+
+    def _scrub(self, batch_size, bytes_per_second, max_duration):
+        """Verify files in batches until the end or ``max_duration`` seconds."""
+        self.ensure_one()
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        file_model = self.env["dms.file"].sudo().with_context(active_test=False)
+        budget = IOBudget(bytes_per_second)
+        deadline = time.monotonic() + max_duration
+        while not self.is_complete and time.monotonic() < deadline:
+            files = file_model.search(
+                [("id", ">", self.last_file_id)], order="id", limit=batch_size
+            )
+            file_count, byte_count = 0, 0
+            for dms_file in files:
+                if time.monotonic() >= deadline:
+                    break
+                byte_count += self._verify_file(dms_file, budget)
+                file_count += 1
+                last_file_id = dms_file.id
+            if file_count:
+                self.write(
+                    {
+                        "last_file_id": last_file_id,
+                        "file_count": self.file_count + file_count,
+                        "byte_count": self.byte_count + byte_count,
+                    }
+                )
+            if len(files) < batch_size and file_count == len(files):
+                self.is_complete = True
+            # Contents were read from outside the database: drop them from the
+            # cache, and make the progress survive a crash of the next batch
+            file_model.invalidate_model()
+            if auto_commit:
+                self.env.cr.commit()
+        self.date_end = fields.Datetime.now()
+        _logger.info(
+            "DMS scrubber verified %s files (%s bytes), %s issues",
+            self.file_count,
+            int(self.byte_count),
+            self.issue_count,
+        )
+
+    def _verify_file(self, dms_file, budget):
+        """Re-hash a file and report a mismatch. Return the number of bytes read."""
+        expected = dms_file.checksum or dms_file.attachment_id.checksum
+        if not expected:
+            return 0
+        sha1 = hashlib.sha1()
+        size = 0
+        error = False
+        try:
+            for chunk in dms_file._iter_content():
+                sha1.update(chunk)
+                size += len(chunk)
+                budget.consume(len(chunk))
+            computed = sha1.hexdigest()
+        except (ValueError, *compression.DECOMPRESSION_ERRORS) as exception:
+            # Unreadable files, or corrupted compressed or encoded contents
+            computed = False
+            error = str(exception)
+        issue_model = self.env["dms.integrity.issue"]
+        if computed == expected:
+            issue_model._resolve(dms_file)
+        else:
+            issue_model._report(dms_file, self, expected, computed, error)
+        return size
+
+
+class DmsIntegrityIssue(models.Model):
+    _name = "dms.integrity.issue"
+    _description = "Integrity Issue"
+    _order = "id desc"
+    _rec_name = "file_id"
+
+    file_id = fields.Many2one(
+        comodel_name="dms.file",
+        string="File",
+        required=True,
+        readonly=True,
+        ondelete="cascade",
+        index="btree",
+    )
+    storage_id = fields.Many2one(
+        related="file_id.storage_id", string="Storage", readonly=True
+    )
+    run_id = fields.Many2one(
+        comodel_name="dms.scrub.run",
+        string="Scrub Run",
+        readonly=True,
+        ondelete="set null",
+    )
+    save_type = fields.Char(string="Save Type", readonly=True)
+    expected_checksum = fields.Char(readonly=True)
+    computed_checksum = fields.Char(readonly=True)
+    error = fields.Text(readonly=True)
+    state = fields.Selection(
+        selection=[("open", "Open"), ("resolved", "Resolved")],
+        default="open",
+        required=True,
+    )
+
+    @api.model
+    def _report(self, dms_file, run, expected, computed, error=False):
+        vals = {
+            "run_id": run.id,
+            "save_type": dms_file.save_type,
+            "expected_checksum": expected,
+            "computed_checksum": computed,
+            "error": error,
+        }
+        issue = self.search(
+            [("file_id", "=", dms_file.id), ("state", "=", "open")], limit=1
+        )
+        if issue:
+            issue.write(vals)
+        else:
+            _logger.warning("DMS file %s does not match its checksum", dms_file.id)
+            issue = self.create(dict(vals, file_id=dms_file.id))
+        return issue
+
+    @api.model
+    def _resolve(self, dms_file):
+        issues = self.search([("file_id", "=", dms_file.id), ("state", "=", "open")])
+        issues.action_resolve()
+
+    def action_resolve(self):
+        self.write({"state": "resolved"})
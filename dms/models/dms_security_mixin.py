@@ -6,13 +6,14 @@
 
 from logging import getLogger
 
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 from odoo.osv.expression import (
     FALSE_DOMAIN,
     NEGATIVE_TERM_OPERATORS,
     OR,
     TRUE_DOMAIN,
 )
+from odoo.tools import SQL
 
 _logger = getLogger(__name__)
 
@@ -35,21 +36,27 @@ class DmsSecurityMixin(models.AbstractModel):
         compute="_compute_record_ref",
         selection=lambda self: self._get_ref_selection(),
     )
+    # Computed for the current user and searched by the record rules, through
+    # the access groups and the access inherited from the linked records
     permission_read = fields.Boolean(
         string="Read Access",
-        default=True,
+        compute="_compute_permissions",
+        search="_search_permission_read",
     )
     permission_create = fields.Boolean(
         string="Create Access",
-        default=True,
+        compute="_compute_permissions",
+        search="_search_permission_create",
     )
     permission_write = fields.Boolean(
         string="Write Access",
-        default=True,
+        compute="_compute_permissions",
+        search="_search_permission_write",
     )
     permission_unlink = fields.Boolean(
         string="Delete Access",
-        default=True,
+        compute="_compute_permissions",
+        search="_search_permission_unlink",
     )
 
     @api.model
@@ -64,13 +71,13 @@ class DmsSecurityMixin(models.AbstractModel):
             if record.res_model and record.res_id:
                 record.record_ref = f"{record.res_model},{record.res_id}"
 
+    @api.depends_context("uid")
     def _compute_permissions(self):
         """
         Get permissions for the current record.
-        """
 
-        # Update according to presence when applying ir.rule
-        self.invalidate_recordset()
+        The record rules of the four operations are evaluated in a single query.
+        """
         if self.env.su:
             self.update(
                 {
@@ -81,26 +88,102 @@ class DmsSecurityMixin(models.AbstractModel):
                 }
             )
             return
-
-        creatable = self._filter_access_rules("create")
-        readable = self._filter_access_rules("read")
-        unlinkable = self._filter_access_rules("unlink")
-        writeable = self._filter_access_rules("write")
+        operations = ("create", "read", "unlink", "write")
+        ids = tuple(id_ for id_ in self._ids if isinstance(id_, int))
+        permissions = {}
+        if ids:
+            table_id = SQL.identifier(self._table, "id")
+            checks = []
+            for operation in operations:
+                query = self._where_calc([], active_test=False)
+                self._apply_ir_rules(query, operation)
+                checks.append(
+                    SQL("%s IN %s", table_id, query.subselect())
+                    if query.where_clause
+                    else SQL("TRUE")
+                )
+            self.env.cr.execute(
+                SQL(
+                    "SELECT %s, %s FROM %s WHERE %s IN %s",
+                    table_id,
+                    SQL(", ").join(checks),
+                    SQL.identifier(self._table),
+                    table_id,
+                    ids,
+                )
+            )
+            permissions = {row[0]: row[1:] for row in self.env.cr.fetchall()}
         for one in self:
+            # New records are not subject to the rules yet
+            flags = permissions.get(one.id, [not isinstance(one.id, int)] * 4)
             one.update(
                 {
-                    "permission_create": bool(one & creatable),
-                    "permission_read": bool(one & readable),
-                    "permission_unlink": bool(one & unlinkable),
-                    "permission_write": bool(one & writeable),
+                    f"permission_{operation}": flag
+                    for operation, flag in zip(operations, flags)
                 }
             )
 
+    def init(self):
+        self.env.cr.execute(
+            "CREATE SEQUENCE IF NOT EXISTS dms_inherited_access_version_seq"
+        )
+
+    @api.model
+    def _get_inherited_access_version(self):
+        """Return the version of the data the inherited access depends on."""
+        self.env.cr.execute("SELECT last_value FROM dms_inherited_access_version_seq")
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _invalidate_inherited_access(self):
+        """Discard the cached domains of the inherited access.
+
+        Sequences are not transactional: the version is bumped again once the
+        transaction is committed, as concurrent transactions may cache domains
+        not seeing its changes in the meantime.
+        """
+        self.env.cr.execute("SELECT nextval('dms_inherited_access_version_seq')")
+        if self.env.cr.postcommit.data.get("dms_inherited_access"):
+            return
+        self.env.cr.postcommit.data["dms_inherited_access"] = True
+        registry = self.env.registry
+
+        def bump_version():
+            with registry.cursor() as cr:
+                cr.execute("SELECT nextval('dms_inherited_access_version_seq')")
+
+        self.env.cr.postcommit.add(bump_version)
+
     @api.model
     def _get_domain_by_inheritance(self, operation):
         """Get domain for inherited accessible records."""
         if self.env.su:
             return []
+        # The changes of the record rules and of the groups clear the cache,
+        # the links to records and the changes of the linked records bump the
+        # version (see dms.storage._patch_inherited_access_models)
+        return list(
+            self._get_domain_by_inheritance_cached(
+                operation,
+                self._get_inherited_access_version(),
+                tuple(self.env.context.get("allowed_company_ids") or ()),
+            )
+        )
+
+    @api.model
+    @tools.ormcache("self.env.uid", "operation", "version", "company_ids")
+    def _get_domain_by_inheritance_cached(self, operation, version, company_ids):
+        return self._compute_domain_by_inheritance(operation)
+
+    @api.model
+    def _compute_domain_by_inheritance(self, operation, stats=None):
+        """Compute the domain of the records accessible through the records
+        they are linked to.
+
+        :param dict stats: Filled with the number of linked records checked.
+        """
+        if stats is not None:
+            stats.setdefault("checked_records", 0)
         inherited_access_field = "storage_id_inherit_access_from_parent_record"
         if self._name != "dms.directory":
             inherited_access_field = f"{self._directory_field}.{inherited_access_field}"
@@ -139,6 +222,8 @@ class DmsSecurityMixin(models.AbstractModel):
             # Apply exists to skip records that do not exist. (e.g. a res.partner
             # deleted by database).
             model_records = model.browse(res_ids).exists()
+            if stats is not None:
+                stats["checked_records"] += len(model_records)
             related_ok = model_records._filter_access_rules_python(operation)
             if not related_ok:
                 continue
@@ -150,24 +235,28 @@ class DmsSecurityMixin(models.AbstractModel):
 
     @api.model
     def _get_access_groups_query(self, operation):
-        """Return the query to select access groups."""
+        """Return the query to select the directories accessible through the
+        access groups, looked up in the materialized permissions of the user."""
         operation_check = {
-            "create": "AND dag.perm_inclusive_create",
+            "create": "AND perm.perm_create",
             "read": "",
-            "unlink": "AND dag.perm_inclusive_unlink",
-            "write": "AND dag.perm_inclusive_write",
+            "unlink": "AND perm.perm_unlink",
+            "write": "AND perm.perm_write",
         }[operation]
+        # The table is maintained by triggers on the flushed tables
+        self.env["dms.directory"].flush_model(["complete_group_ids"])
+        self.env["dms.access.group"].flush_model(
+            [
+                "users",
+                "perm_inclusive_create",
+                "perm_inclusive_unlink",
+                "perm_inclusive_write",
+            ]
+        )
         select = f"""
-            SELECT
-                dir_group_rel.aid
-            FROM
-                dms_directory_complete_groups_rel AS dir_group_rel
-                INNER JOIN dms_access_group AS dag
-                    ON dir_group_rel.gid = dag.id
-                INNER JOIN dms_access_group_users_rel AS users
-                    ON users.gid = dag.id
-            WHERE
-                users.uid = %s {operation_check}
+            SELECT perm.directory_id
+            FROM dms_directory_user_permission AS perm
+            WHERE perm.user_id = %s {operation_check}
             """
         return select, (self.env.uid,)
 
@@ -256,4 +345,16 @@ class DmsSecurityMixin(models.AbstractModel):
         res = res.sudo(self.env.su)
         res.check_access_rights("create")
         res.check_access_rule("create")
+        if any(vals.get("res_model") for vals in vals_list):
+            self._invalidate_inherited_access()
         return res
+
+    def write(self, vals):
+        if {"res_model", "res_id", "storage_id", self._directory_field} & set(vals):
+            self._invalidate_inherited_access()
+        return super().write(vals)
+
+    def unlink(self):
+        if any(self.sudo().mapped("res_model")):
+            self._invalidate_inherited_access()
+        return super().unlink()
@@ -0,0 +1,207 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo import _, api, fields, models
+
+from ..tools import file
+
+_logger = logging.getLogger(__name__)
+
+
+class DmsStorageMigration(models.Model):
+    """Migration of the files of a storage to its current save type.
+
+    Files are migrated by increasing id in batches, each one committed on its
+    own, so an interrupted migration resumes after the last migrated batch.
+    Contents are read and hashed by a pool of threads while the database is
+    only accessed by the main one.
+    """
+
+    _name = "dms.storage.migration"
+    _description = "Storage Migration"
+    _order = "id desc"
+    _rec_name = "storage_id"
+
+    storage_id = fields.Many2one(
+        comodel_name="dms.storage",
+        string="Storage",
+        required=True,
+        readonly=True,
+        ondelete="cascade",
+        index="btree",
+    )
+    state = fields.Selection(
+        selection=[("running", "Running"), ("done", "Done")],
+        default="running",
+        required=True,
+        readonly=True,
+    )
+    batch_size = fields.Integer(required=True, readonly=True)
+    workers = fields.Integer(required=True, readonly=True)
+    date_start = fields.Datetime(
+        string="Start Date", default=fields.Datetime.now, readonly=True
+    )
+    date_end = fields.Datetime(string="End Date", readonly=True)
+    last_file_id = fields.Integer(
+        string="Last File ID",
+        readonly=True,
+        help="Last file processed. The migration resumes after it.",
+    )
+    total_count = fields.Integer(string="Files to Migrate", readonly=True)
+    done_count = fields.Integer(string="Migrated Files", readonly=True)
+    error_count = fields.Integer(string="Errors", readonly=True)
+    last_error = fields.Text(readonly=True)
+    progress = fields.Float(compute="_compute_progress")
+
+    @api.depends("total_count", "done_count", "error_count")
+    def _compute_progress(self):
+        for record in self:
+            processed = record.done_count + record.error_count
+            record.progress = (
+                100.0 * processed / record.total_count if record.total_count else 100.0
+            )
+
+    @api.model
+    def _get_migration_params(self):
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        return {
+            "batch_size": int(get_param("dms.migration_batch_size", default=100)),
+            "workers": int(get_param("dms.migration_workers", default=4)),
+        }
+
+    @api.model
+    def _start(self, storage):
+        """Create the migration job of a storage, unless one is running."""
+        job = self.search(
+            [("storage_id", "=", storage.id), ("state", "=", "running")], limit=1
+        )
+        if job:
+            return job
+        return self.create(
+            dict(
+                self._get_migration_params(),
+                storage_id=storage.id,
+                total_count=self._count_files_to_migrate(storage),
+            )
+        )
+
+    @api.model
+    def _count_files_to_migrate(self, storage):
+        return (
+            self.env["dms.file"]
+            .sudo()
+            .with_context(active_test=False)
+            .search_count(
+                [("storage_id", "=", storage.id), ("require_migration", "=", True)]
+            )
+        )
+
+    @api.model
+    def _cron_process_migrations(self):
+        """Resume the interrupted migrations."""
+        self.search([("state", "=", "running")])._run()
+
+    def _lock(self):
+        """Lock the job for the current batch, unless another worker has it."""
+        self.env.cr.execute(
+            """
+            SELECT id FROM dms_storage_migration
+            WHERE id = %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (self.id,),
+        )
+        if not self.env.cr.fetchone():
+            return False
+        self.invalidate_recordset()
+        return True
+
+    def _run(self):
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        file_model = self.env["dms.file"].sudo().with_context(active_test=False)
+        for job in self:
+            while job._lock() and job.state == "running":
+                files = file_model.search(
+                    [
+                        ("storage_id", "=", job.storage_id.id),
+                        ("require_migration", "=", True),
+                        ("id", ">", job.last_file_id),
+                    ],
+                    order="id",
+                    limit=job.batch_size,
+                )
+                if files:
+                    job._migrate_batch(files)
+                else:
+                    job.write({"state": "done", "date_end": fields.Datetime.now()})
+                    _logger.info(
+                        "Migration of DMS storage %s done: %s files, %s errors",
+                        job.storage_id.id,
+                        job.done_count,
+                        job.error_count,
+                    )
+                if auto_commit:
+                    self.env.cr.commit()
+
+    def _migrate_batch(self, files):
+        """Migrate a batch of files, spooling their contents in parallel.
+
+        The contents are opened by the thread owning the cursor, each one only
+        once a worker is free to spool it, so that a single content per worker
+        is held in memory.
+        """
+        self.ensure_one()
+        spool_dir = files._get_spool_dir()
+        workers = max(self.workers, 1)
+        slots = threading.BoundedSemaphore(workers)
+
+        def spool(stream):
+            try:
+                return file.spool_stream(stream, spool_dir)
+            finally:
+                slots.release()
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for dms_file in files:
+                slots.acquire()
+                try:
+                    stream = dms_file.open_content()
+                except Exception as exception:
+                    slots.release()
+                    results[dms_file] = exception
+                    continue
+                results[dms_file] = executor.submit(spool, stream)
+        done_count, errors = 0, []
+        for dms_file, result in results.items():
+            path = None
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                path, checksum = result.result()
+                if dms_file.checksum and dms_file.checksum != checksum:
+                    raise ValueError(_("The content does not match its checksum."))
+                with self.env.cr.savepoint():
+                    dms_file._write_content_from_path(path, checksum=checksum)
+                done_count += 1
+            except Exception as exception:
+                _logger.warning(
+                    "Cannot migrate DMS file %s", dms_file.id, exc_info=True
+                )
+                dms_file.invalidate_recordset()
+                errors.append(f"{dms_file.display_name} ({dms_file.id}): {exception}")
+            finally:
+                if path and os.path.exists(path):
+                    os.unlink(path)
+        vals = {
+            "last_file_id": files[-1].id,
+            "done_count": self.done_count + done_count,
+            "error_count": self.error_count + len(errors),
+        }
+        if errors:
+            vals["last_error"] = "\n".join(errors)
+        self.write(vals)
@@ -0,0 +1,228 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import base64
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Largest side of the generated thumbnails, the size of image_1920
+THUMBNAIL_SIZE = (1920, 1920)
+# Failed items are dropped after this many attempts
+THUMBNAIL_MAX_ATTEMPTS = 3
+
+
+class ThumbnailDeferred(Exception):
+    """The image is too large to be rendered along with the others."""
+
+
+def decoded_size(image):
+    """Return the memory used by the decoded bitmap of an image in bytes.
+
+    Pillow stores the pixels on one byte for the single band modes, and on
+    four bytes for the others.
+    """
+    pixel_size = 1 if image.mode in ("1", "L", "P") else 4
+    return image.width * image.height * pixel_size
+
+
+def render_thumbnail(stream, max_pixels=None, max_memory=None):
+    """Return the ``image_1920`` of an image content read from ``stream``.
+
+    Runs outside of any environment, in the threads of the worker pool. Only
+    the header of the image is read before the limits are checked.
+
+    :param int max_pixels: Images having more pixels raise ``ThumbnailDeferred``.
+    :param int max_memory: Images whose decoded bitmap, at the reduced scale
+        they can be decoded at, would use more bytes are refused.
+    """
+    with stream:
+        header = stream.read(1)
+        stream.seek(0)
+        if header == b"<":
+            # SVG images are kept as they are by the image fields
+            return stream.read()
+        with Image.open(stream) as image:
+            if max_pixels and image.width * image.height > max_pixels:
+                raise ThumbnailDeferred()
+            # Let JPEG images be decoded at a reduced scale
+            image.draft("RGB", THUMBNAIL_SIZE)
+            if max_memory and decoded_size(image) > max_memory:
+                raise ValueError(
+                    "Decoding the %sx%s image would use more than %s bytes"
+                    % (image.width, image.height, max_memory)
+                )
+            # Reduce by integer factors before resampling the bitmap
+            image.thumbnail(THUMBNAIL_SIZE, reducing_gap=2.0)
+            output = io.BytesIO()
+            if image.mode in ("RGBA", "LA", "P"):
+                image.save(output, format="PNG")
+            else:
+                image.convert("RGB").save(output, format="JPEG", quality=90)
+            return output.getvalue()
+
+
+class DmsThumbnailQueue(models.Model):
+    """Files whose thumbnail is waiting to be generated.
+
+    Thumbnails are generated by a pool of threads out of the transaction which
+    saved the content, the extension icon being shown in the meantime.
+    """
+
+    _name = "dms.thumbnail.queue"
+    _description = "Thumbnail Queue"
+    _order = "id"
+    _rec_name = "file_id"
+
+    file_id = fields.Many2one(
+        comodel_name="dms.file",
+        string="File",
+        required=True,
+        readonly=True,
+        ondelete="cascade",
+    )
+    attempts = fields.Integer(readonly=True, default=0)
+    deferred = fields.Boolean(
+        readonly=True,
+        help="The image is larger than the pixel limit and is rendered by "
+        "the background pass, one at a time.",
+    )
+    error = fields.Text(readonly=True)
+
+    _sql_constraints = [
+        ("file_uniq", "unique (file_id)", "A file can only be queued once!")
+    ]
+
+    @api.model
+    def _enqueue(self, files):
+        """Queue the thumbnail generation of ``files``, again if needed.
+
+        Inserted with SQL as it is called from the computation of the images.
+        """
+        if not files:
+            return
+        self.env.cr.execute(
+            """
+            INSERT INTO dms_thumbnail_queue
+                (file_id, attempts, deferred,
+                 create_uid, create_date, write_uid, write_date)
+            SELECT file_id, 0, FALSE, %(uid)s, %(now)s, %(uid)s, %(now)s
+            FROM unnest(%(ids)s) AS file_id
+            ON CONFLICT (file_id) DO UPDATE
+            SET attempts = 0, error = NULL, deferred = FALSE,
+                write_date = EXCLUDED.write_date
+            """,
+            {"uid": self.env.uid, "ids": files.ids, "now": fields.Datetime.now()},
+        )
+        self.invalidate_model()
+
+    @api.model
+    def _get_queue_params(self):
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        return {
+            "batch_size": int(get_param("dms.thumbnail_batch_size", default=20)),
+            "workers": int(get_param("dms.thumbnail_workers", default=2)),
+            "max_duration": int(get_param("dms.thumbnail_max_duration", default=300)),
+            "max_pixels": int(
+                get_param("dms.thumbnail_max_pixels", default=40_000_000)
+            ),
+            # In megabytes
+            "max_memory": int(get_param("dms.thumbnail_max_memory", default=1024))
+            * 1024
+            * 1024,
+        }
+
+    @api.model
+    def _cron_process_thumbnails(self):
+        self.sudo()._process_queue(**self._get_queue_params())
+
+    @api.model
+    def _process_queue(
+        self,
+        batch_size=20,
+        workers=2,
+        max_duration=300,
+        auto_commit=True,
+        max_pixels=None,
+        max_memory=None,
+    ):
+        """Generate the queued thumbnails in batches, each one committed.
+
+        Images above ``max_pixels`` are deferred to a second pass rendering
+        them one at a time, so that a single large bitmap is decoded at once.
+        """
+        auto_commit = auto_commit and not getattr(
+            threading.current_thread(), "testing", False
+        )
+        deadline = time.monotonic() + max_duration
+        passes = [(False, batch_size, workers, max_pixels), (True, 1, 1, None)]
+        for deferred, pass_size, pass_workers, pass_max_pixels in passes:
+            # Failed items are retried by the next runs only
+            last_id = 0
+            while time.monotonic() < deadline:
+                self.env.flush_all()
+                # Let several workers process the queue at the same time
+                self.env.cr.execute(
+                    """
+                    SELECT id FROM dms_thumbnail_queue
+                    WHERE id > %s AND attempts < %s AND deferred IS %s
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                    """,
+                    (last_id, THUMBNAIL_MAX_ATTEMPTS, deferred, pass_size),
+                )
+                items = self.browse([row[0] for row in self.env.cr.fetchall()])
+                if not items:
+                    break
+                last_id = items[-1].id
+                items._process_batch(
+                    pass_workers, max_pixels=pass_max_pixels, max_memory=max_memory
+                )
+                if auto_commit:
+                    self.env.cr.commit()
+
+    def _process_batch(self, workers, max_pixels=None, max_memory=None):
+        # The content may have changed to something else than an image
+        outdated = self.filtered(lambda item: not item.file_id._has_thumbnail())
+        outdated.unlink()
+        self -= outdated
+        streams = {}
+        for item in self:
+            try:
+                streams[item] = item.file_id.open_content()
+            except Exception as exception:
+                item._record_failure(exception)
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = {
+                item: executor.submit(render_thumbnail, stream, max_pixels, max_memory)
+                for item, stream in streams.items()
+            }
+        done = self.browse()
+        for item, future in futures.items():
+            try:
+                image = future.result()
+            except ThumbnailDeferred:
+                item.deferred = True
+                continue
+            except Exception as exception:
+                item._record_failure(exception)
+                continue
+            item.file_id.image_1920 = base64.b64encode(image)
+            done |= item
+        done.unlink()
+
+    def _record_failure(self, exception):
+        _logger.info(
+            "Cannot generate the thumbnail of DMS file %s: %s",
+            self.file_id.id,
+            exception,
+        )
+        self.write({"attempts": self.attempts + 1, "error": str(exception)})
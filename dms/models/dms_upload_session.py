@@ -0,0 +1,209 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from odoo import _, api, fields, models, tools
+from odoo.exceptions import AccessError, UserError, ValidationError
+from odoo.tools.lru import LRU
+
+from ..tools.file import check_name
+
+_logger = logging.getLogger(__name__)
+
+# Per worker running SHA1 of the sessions whose chunks it received in order,
+# as {(dbname, token): (received size, sha1)}
+RUNNING_CHECKSUMS = LRU(256)
+
+
+class DmsUploadSession(models.Model):
+    """Chunked upload of a file into a directory.
+
+    Chunks are appended to a spool file in the filestore, so an interrupted
+    upload can be resumed from the last received offset. Finalizing the
+    session creates the ``dms.file`` from the spool file.
+    """
+
+    _name = "dms.upload.session"
+    _description = "Upload Session"
+    _order = "id desc"
+
+    name = fields.Char(required=True, readonly=True)
+    token = fields.Char(
+        required=True,
+        readonly=True,
+        copy=False,
+        index="btree",
+        default=lambda self: uuid.uuid4().hex,
+    )
+    directory_id = fields.Many2one(
+        comodel_name="dms.directory",
+        string="Directory",
+        required=True,
+        readonly=True,
+        ondelete="cascade",
+    )
+    size = fields.Integer(required=True, readonly=True)
+    received = fields.Integer(readonly=True, default=0)
+    state = fields.Selection(
+        selection=[("pending", "Pending"), ("done", "Done")],
+        default="pending",
+        required=True,
+        readonly=True,
+    )
+    file_id = fields.Many2one(
+        comodel_name="dms.file", string="File", readonly=True, ondelete="set null"
+    )
+
+    _sql_constraints = [
+        ("token_uniq", "unique (token)", "The upload token must be unique!")
+    ]
+
+    @api.model
+    def start(self, directory_id, name, size):
+        """Open an upload session after checking it can succeed."""
+        directory = self.env["dms.directory"].browse(directory_id).exists()
+        if not directory:
+            raise UserError(_("The directory does not exist anymore."))
+        directory.check_access_rule("read")
+        file_model = self.env["dms.file"]
+        file_model.check_access_rights("create")
+        if not directory.permission_create:
+            raise AccessError(
+                _("You are not allowed to create files in this directory.")
+            )
+        if not check_name(name):
+            raise ValidationError(_("The file name is invalid."))
+        extension = os.path.splitext(name)[1][1:].strip().lower()
+        if extension and extension in file_model._get_forbidden_extensions():
+            raise ValidationError(_("The file has a forbidden file extension."))
+        if size > file_model._get_binary_max_size() * 1024 * 1024:
+            raise ValidationError(
+                _("The maximum upload size is %s MB.")
+                % file_model._get_binary_max_size()
+            )
+        return self.create({"directory_id": directory.id, "name": name, "size": size})
+
+    @api.model
+    def _get_by_token(self, token):
+        session = self.search([("token", "=", token)], limit=1)
+        if not session:
+            raise UserError(_("The upload session does not exist anymore."))
+        return session
+
+    def _get_spool_path(self):
+        self.ensure_one()
+        return os.path.join(
+            tools.config.filestore(self.env.cr.dbname), "dms_upload", self.token
+        )
+
+    def append_chunk(self, offset, data, checksum=None):
+        """Write ``data`` at ``offset`` and return the new received size.
+
+        A chunk may start before the received size, when the client resends
+        data whose acknowledgement was lost: the spool file is then truncated
+        at ``offset`` first.
+        """
+        self.ensure_one()
+        # Serialize the chunks of a session sent concurrently
+        self.env.cr.execute(
+            "SELECT id FROM dms_upload_session WHERE id = %s FOR UPDATE", (self.id,)
+        )
+        self.invalidate_recordset(["received", "state"])
+        if self.state != "pending":
+            raise UserError(_("The upload is already finished."))
+        if offset < 0 or offset > self.received:
+            raise UserError(_("Expected a chunk at offset %s.") % self.received)
+        if offset + len(data) > self.size:
+            raise UserError(_("The chunk exceeds the announced file size."))
+        if checksum and hashlib.sha1(data).hexdigest() != checksum:
+            raise UserError(_("The chunk was corrupted during the transfer."))
+        path = self._get_spool_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as spool:
+            spool.seek(offset)
+            spool.truncate()
+            spool.write(data)
+        self._update_running_checksum(offset, data)
+        self.received = offset + len(data)
+        return self.received
+
+    def _update_running_checksum(self, offset, data):
+        """Hash the chunks as they arrive, when this worker received all the
+        previous ones. Resent chunks drop the running hash."""
+        key = (self.env.cr.dbname, self.token)
+        received, sha1 = RUNNING_CHECKSUMS.get(key, (0, None))
+        if offset == 0:
+            received, sha1 = 0, hashlib.sha1()
+        if sha1 is None or offset != received:
+            RUNNING_CHECKSUMS.pop(key, None)
+            return
+        sha1.update(data)
+        RUNNING_CHECKSUMS[key] = (offset + len(data), sha1)
+
+    def _get_running_checksum(self):
+        """Return the checksum of the whole content if this worker hashed it."""
+        received, sha1 = RUNNING_CHECKSUMS.pop(
+            (self.env.cr.dbname, self.token), (0, None)
+        )
+        if sha1 is None or received != self.size:
+            return None
+        return sha1.hexdigest()
+
+    def finalize(self):
+        """Create the file from the received chunks."""
+        self.ensure_one()
+        if self.state == "done":
+            return self.file_id
+        if self.received != self.size:
+            raise UserError(
+                _("The upload is incomplete: %(received)s of %(size)s bytes.")
+                % {"received": self.received, "size": self.size}
+            )
+        path = self._get_spool_path()
+        if not os.path.exists(path):
+            # Nothing was ever sent for an empty file
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "wb").close()
+        # The file creation consumes its input: work on a link to the spool
+        # file so that the upload can still be finalized again on failure.
+        work_path = "{}.{}".format(path, uuid.uuid4().hex)
+        try:
+            os.link(path, work_path)
+        except OSError:
+            shutil.copyfile(path, work_path)
+        # Hashed again from the spool file by another worker
+        dms_file = self.env["dms.file"]._create_from_path(
+            {"name": self.name, "directory_id": self.directory_id.id},
+            work_path,
+            checksum=self._get_running_checksum(),
+        )
+        self.write({"state": "done", "file_id": dms_file.id})
+        self.env.cr.postcommit.add(lambda: self._remove_spool_files([path]))
+        return dms_file
+
+    @api.model
+    def _remove_spool_files(self, paths):
+        for path in paths:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def unlink(self):
+        paths = [session._get_spool_path() for session in self]
+        res = super().unlink()
+        self.env.cr.postcommit.add(lambda: self._remove_spool_files(paths))
+        return res
+
+    @api.autovacuum
+    def _gc_upload_sessions(self):
+        """Drop finished sessions and the ones abandoned for two days."""
+        limit = fields.Datetime.now() - timedelta(days=2)
+        sessions = self.sudo().search(
+            ["|", ("state", "=", "done"), ("write_date", "<", limit)]
+        )
+        _logger.info("Removing %s DMS upload sessions", len(sessions))
+        sessions.unlink()
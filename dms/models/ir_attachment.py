@@ -1,8 +1,13 @@
 # Copyright 2021-2025 Tecnativa - Víctor Martínez
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import os
+import shutil
+
 from odoo import api, models
 from odoo.tools import ormcache
 
+from ..tools.file import checksum_path
+
 
 class IrAttachment(models.Model):
     _inherit = "ir.attachment"
@@ -35,6 +40,36 @@ class IrAttachment(models.Model):
                 }
             )
 
+    @api.model
+    def _dms_create_from_path(self, path, vals, checksum=None):
+        """Create an attachment from a file on disk without loading it.
+
+        With the filestore enabled the file is moved in place and consumed,
+        identical contents sharing the same filestore file.
+        """
+        checksum = checksum or checksum_path(path)
+        attachment_model = self.sudo().with_context(dms_file=True)
+        if self._storage() != "file":
+            with open(path, "rb") as stream:
+                vals = dict(vals, raw=stream.read())
+            os.unlink(path)
+            return attachment_model.create(vals)
+        fname, full_path = self._get_path(None, checksum)
+        if os.path.exists(full_path):
+            os.unlink(path)
+        else:
+            shutil.move(path, full_path)
+        # Let the filestore garbage collector drop it if the transaction fails
+        self._mark_for_gc(fname)
+        return attachment_model.create(
+            dict(
+                vals,
+                store_fname=fname,
+                file_size=os.path.getsize(full_path),
+                checksum=checksum,
+            )
+        )
+
     @ormcache("model")
     def _dms_operations_from_model(self, model):
         # Apply sudo to prevent ir.rule from being applied.
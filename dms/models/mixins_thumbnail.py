@@ -9,33 +9,68 @@ from odoo import api, fields, models
 from odoo.tools.misc import file_path
 
 
+ICONS_PATH = os.path.join("dms", "static", "icons")
+ICONS_URL = "/dms/static/icons/%s"
+UNKNOWN_ICON = "file_unknown.svg"
+
+
 class Thumbnail(models.AbstractModel):
     _name = "dms.mixins.thumbnail"
     _inherit = "image.mixin"
     _description = "DMS thumbnail and icon mixin"
 
+    # Names of the icons of the module, indexed once at the registry load
+    _icon_names = frozenset()
+
     icon_url = fields.Char(string="Icon URL", compute="_compute_icon_url")
 
-    def _get_icon_disk_path(self):
-        """Get the local disk path to record icon."""
-        name = self._get_icon_placeholder_name()
-        folders = ["dms", "static", "icons"]
+    def _register_hook(self):
+        super()._register_hook()
+        type(self)._icon_names = self._index_icons()
 
-        try:
-            path = file_path(os.path.join(*folders, name))
-        except FileNotFoundError:
-            return file_path(os.path.join(*folders, "file_unknown.svg"))
+    @api.model
+    def _index_icons(self):
+        return frozenset(
+            name
+            for name in os.listdir(file_path(ICONS_PATH))
+            if name.endswith(".svg")
+        )
 
-        return path or file_path(os.path.join(*folders, "file_unknown.svg"))
+    def _get_icon_disk_path(self):
+        """Get the local disk path to record icon."""
+        return file_path(os.path.join(ICONS_PATH, self._get_icon_name()))
 
     def _get_icon_placeholder_name(self):
         return "folder.svg"
 
+    def _get_icon_name(self):
+        name = self._get_icon_placeholder_name()
+        return name if name in self._icon_names else UNKNOWN_ICON
+
     def _get_icon_url(self):
         """Obtain URL to record icon."""
-        local_path = self._get_icon_disk_path()
-        icon_name = os.path.basename(local_path)
-        return "/dms/static/icons/%s" % icon_name
+        return ICONS_URL % self._get_icon_name()
+
+    @api.model
+    def get_icon_map(self):
+        """Return the URL of the icon of each known file extension, so that
+        clients can resolve icons without requesting the records.
+
+        :return: ``{"icons": {extension: url}, "folder": url, "unknown": url}``
+        """
+        return {
+            "icons": {
+                name[len("file_") : -len(".svg")]: ICONS_URL % name
+                for name in self._icon_names
+                if name.startswith("file_") and name != UNKNOWN_ICON
+            },
+            "folder": ICONS_URL % "folder.svg",
+            "unknown": ICONS_URL % UNKNOWN_ICON,
+        }
+
+    def _get_thumbnail_url(self):
+        """Obtain URL to record thumbnail."""
+        return f"/web/image/{self._name}/{self.id}/image_128/128x128"
 
     @api.depends("image_128")
     def _compute_icon_url(self):
@@ -43,7 +78,7 @@ class Thumbnail(models.AbstractModel):
         for one in self:
             # Get URL to thumbnail or to the default icon by file extension
             one.icon_url = (
-                f"/web/image/{one._name}/{one.id}/image_128/128x128?crop=1"
+                f"{one._get_thumbnail_url()}?crop=1"
                 if one.image_128
                 else f"{one._get_icon_url()}?crop=1"
             )
@@ -0,0 +1,43 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from odoo import models
+
+
+class ResGroups(models.Model):
+    _inherit = "res.groups"
+
+    def write(self, vals):
+        if not {"users", "implied_ids"} & set(vals):
+            return super().write(vals)
+        # The users of the implied groups are added by SQL
+        groups = self._get_dms_related_groups()
+        res = super().write(vals)
+        (groups | self._get_dms_related_groups())._sync_dms_access_groups()
+        return res
+
+    def unlink(self):
+        # The relation to the access groups is deleted along with the groups
+        access_groups = self._get_dms_access_groups()
+        res = super().unlink()
+        access_groups._sync_users()
+        return res
+
+    def _get_dms_related_groups(self):
+        """Return the groups along with the ones they imply and the ones
+        implying them, whose users may change with theirs."""
+        groups = self.sudo()
+        related = groups | groups.trans_implied_ids
+        implying = groups
+        while implying:
+            implying = groups.search([("implied_ids", "in", implying.ids)]) - related
+            related |= implying
+        return related
+
+    def _get_dms_access_groups(self):
+        return (
+            self.env["dms.access.group"].sudo().search([("group_ids", "in", self.ids)])
+        )
+
+    def _sync_dms_access_groups(self):
+        """Update the users of the DMS access groups based on the groups."""
+        return self._get_dms_access_groups()._sync_users()
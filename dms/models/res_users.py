@@ -0,0 +1,28 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from odoo import api, models
+
+
+class ResUsers(models.Model):
+    _inherit = "res.users"
+
+    @api.model
+    def _is_groups_update(self, vals):
+        return any(
+            key == "groups_id" or key.startswith(("in_group_", "sel_groups_"))
+            for key in vals
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        users = super().create(vals_list)
+        users.sudo().groups_id._sync_dms_access_groups()
+        return users
+
+    def write(self, vals):
+        if not self._is_groups_update(vals):
+            return super().write(vals)
+        groups = self.sudo().groups_id
+        res = super().write(vals)
+        (groups | self.sudo().groups_id)._sync_dms_access_groups()
+        return res
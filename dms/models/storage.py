@@ -6,7 +6,9 @@
 import logging
 
 from odoo import _, api, fields, models
-from odoo.exceptions import AccessError
+from odoo.exceptions import AccessError, ValidationError
+
+from ..tools.compression import is_compressible, match_mimetype
 
 _logger = logging.getLogger(__name__)
 
@@ -21,6 +23,7 @@ class Storage(models.Model):
             ("database", _("Database")),
             ("file", _("Filestore")),
             ("attachment", _("Attachment")),
+            ("pack", _("Pack Files")),
         ],
         default="database",
         required=True,
@@ -84,12 +87,102 @@ class Storage(models.Model):
         help="Indicate if directories and files auto-create in mail "
         "composition process too",
     )
+    deduplicate_content = fields.Boolean(
+        default=False,
+        help="Store identical contents only once. Files with the same checksum "
+        "share a single reference-counted blob, which is freed when its last "
+        "file is deleted.",
+    )
+    compression = fields.Selection(
+        selection=[
+            ("zlib", "Zlib"),
+            ("bz2", "Bzip2"),
+            ("lzma", "LZMA"),
+        ],
+        string="Compression",
+        help="Compress the content of files saved in the database. Contents "
+        "which already look compressed are stored as is.",
+    )
+    compression_level = fields.Integer(
+        default=6,
+        help="From 1 (fastest) to 9 (smallest).",
+    )
+    compression_mimetypes_allow = fields.Char(
+        string="Compressed Types",
+        help="Comma-separated mimetypes to compress, wildcards allowed "
+        "(e.g: text/*). Leave empty to compress every type.",
+    )
+    compression_mimetypes_deny = fields.Char(
+        string="Uncompressed Types",
+        default="image/*,video/*,audio/*,application/zip,application/gzip,"
+        "application/x-7z-compressed,application/x-rar-compressed",
+        help="Comma-separated mimetypes never to compress, wildcards allowed.",
+    )
+    pack_max_file_size = fields.Integer(
+        string="Packed File Size (KB)",
+        default=20,
+        help="Files up to this size are appended to shared pack files, larger "
+        "ones are saved in the filestore.",
+    )
+    pack_segment_size = fields.Integer(
+        string="Pack File Size (MB)",
+        default=64,
+        help="A new pack file is started once the current one reaches this size.",
+    )
+    keep_versions = fields.Boolean(
+        default=False,
+        help="Keep the previous contents of the files when they are replaced.",
+    )
+    version_snapshot_interval = fields.Integer(
+        default=10,
+        help="Previous contents are stored as differences with the previous "
+        "version, with a full copy every this many versions.",
+    )
+    migration_ids = fields.One2many(
+        comodel_name="dms.storage.migration",
+        inverse_name="storage_id",
+        string="Migrations",
+        readonly=True,
+        copy=False,
+    )
     model = fields.Char(search="_search_model", store=False)
 
     def _search_model(self, operator, value):
         allowed_items = self.env["ir.model"].sudo().search([("model", operator, value)])
         return [("model_ids", "in", allowed_items.ids)]
 
+    @api.constrains("compression_level")
+    def _check_compression_level(self):
+        if self.filtered(lambda rec: not 1 <= rec.compression_level <= 9):
+            raise ValidationError(_("The compression level must be between 1 and 9."))
+
+    @api.model
+    def _split_mimetypes(self, mimetypes):
+        mimetypes = (mimetypes or "").split(",")
+        return [mimetype.strip() for mimetype in mimetypes if mimetype.strip()]
+
+    def _get_compression(self, mimetype, binary):
+        """Return the algorithm to compress a database content with, if any."""
+        self.ensure_one()
+        if self.save_type != "database" or not self.compression or not binary:
+            return False
+        allow = self._split_mimetypes(self.compression_mimetypes_allow)
+        if allow and not match_mimetype(mimetype, allow):
+            return False
+        deny = self._split_mimetypes(self.compression_mimetypes_deny)
+        if match_mimetype(mimetype, deny):
+            return False
+        if not is_compressible(binary):
+            return False
+        return self.compression
+
+    def _is_packed(self, size):
+        """Tell if a content of ``size`` bytes is saved in a pack segment."""
+        self.ensure_one()
+        return (
+            self.save_type == "pack" and 0 < size <= self.pack_max_file_size * 1024
+        )
+
     @api.onchange("save_type")
     def _onchange_save_type(self):
         for record in self:
@@ -101,14 +194,11 @@ class Storage(models.Model):
         if self.save_type != "attachment":
             if not self.env.user.has_group("dms.group_dms_manager"):
                 raise AccessError(_("Only managers can execute this action."))
-            files = self.env["dms.file"].with_context(active_test=False).sudo()
-
+            migration_model = self.env["dms.storage.migration"].sudo()
             for record in self:
-                domain = [
-                    ("require_migration", "=", True),
-                    ("storage_id", "=", record.id),
-                ]
-                files.search(domain).action_migrate()
+                migration_model._start(record)
+            # The files are migrated in committed batches by the cron
+            self.env.ref("dms.ir_cron_dms_storage_migration").sudo()._trigger()
 
     def action_save_onboarding_storage_step(self):
         self.env.user.company_id.set_onboarding_step_done(
@@ -126,8 +216,73 @@ class Storage(models.Model):
         for record in self:
             record.count_storage_files = len(record.storage_file_ids)
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records.filtered("inherit_access_from_parent_record").model_ids:
+            self._patch_inherited_access_models()
+        return records
+
     def write(self, values):
         res = super().write(values)
         if "model_ids" in values:
             self.env.registry.clear_cache()
+        if {"save_type", "inherit_access_from_parent_record"} & set(values):
+            self.env["dms.directory"]._invalidate_inherited_access()
+        if {"model_ids", "save_type", "inherit_access_from_parent_record"} & set(
+            values
+        ):
+            self._patch_inherited_access_models()
+        return res
+
+    def _register_hook(self):
+        super()._register_hook()
+        self._patch_inherited_access_models()
+
+    @api.model
+    def _patch_inherited_access_models(self):
+        """Patch the models the access of DMS records is inherited from, so
+        that the changes of their records invalidate the inherited access.
+
+        Models are only patched once, the ones no longer linked keep their
+        patch until the registry is loaded again.
+        """
+        storages = self.sudo().search(
+            [
+                ("save_type", "=", "attachment"),
+                ("inherit_access_from_parent_record", "=", True),
+            ]
+        )
+        patched = False
+        for model_name in set(storages.model_ids.mapped("model")):
+            if model_name not in self.env.registry:
+                continue
+            model_class = self.env.registry[model_name]
+            for name, method in (("write", _make_write()), ("unlink", _make_unlink())):
+                if getattr(getattr(model_class, name), "_dms_inherited_access", False):
+                    continue
+                method.origin = getattr(model_class, name)
+                method._dms_inherited_access = True
+                setattr(model_class, name, method)
+                patched = True
+        if patched and self.env.registry.ready:
+            # Let the other workers patch the models too
+            self.env.registry.registry_invalidated = True
+
+
+def _make_write():
+    def write(self, vals):
+        res = write.origin(self, vals)
+        self.env["dms.directory"]._invalidate_inherited_access()
         return res
+
+    return write
+
+
+def _make_unlink():
+    def unlink(self):
+        res = unlink.origin(self)
+        self.env["dms.directory"]._invalidate_inherited_access()
+        return res
+
+    return unlink
@@ -7,6 +7,7 @@
 
 import {useBus, useService} from "@web/core/utils/hooks";
 import {_t} from "@web/core/l10n/translation";
+import {browser} from "@web/core/browser/browser";
 
 const {useRef, useEffect, useState} = owl;
 
@@ -63,6 +64,10 @@ export function createFileDropZoneExtension() {
     };
 }
 
+// Size of the slices sent to the server, and how often a slice is retried
+const UPLOAD_CHUNK_SIZE = 1024 * 1024;
+const UPLOAD_MAX_ATTEMPTS = 5;
+
 export function createFileUploadExtension() {
     return {
         setup() {
@@ -70,6 +75,7 @@ export function createFileUploadExtension() {
             this.notification = useService("notification");
             this.orm = useService("orm");
             this.http = useService("http");
+            this.rpc = useService("rpc");
             this.fileInput = useRef("fileInput");
 
             useBus(this.env.bus, "change_file_input", async (ev) => {
@@ -82,38 +88,7 @@ export function createFileUploadExtension() {
             this.fileInput.el.click();
         },
 
-        async onChangeFileInput() {
-            const params = {
-                csrf_token: odoo.csrf_token,
-                ufile: [...this.fileInput.el.files],
-                model: "dms.file",
-                id: 0,
-            };
-
-            const fileData = await this.http.post(
-                "/web/binary/upload_attachment",
-                params,
-                "text"
-            );
-            const attachments = JSON.parse(fileData);
-            if (attachments.error) {
-                throw new Error(attachments.error);
-            }
-
-            await this.onUpload(attachments);
-        },
-
-        async onUpload(attachments) {
-            const self = this;
-            const attachmentIds = attachments.map((a) => a.id);
-            const ctx = this.props.context;
-            const controllerID = this.actionService.currentController.jsId;
-
-            if (!attachmentIds.length) {
-                this.notification.add(_t("An error occurred during the upload"));
-                return;
-            }
-
+        getUploadDirectoryId() {
             // Search the correct directory_id value according to the domain
             let directory_id = false;
             if (this.props.domain) {
@@ -128,45 +103,102 @@ export function createFileUploadExtension() {
                     }
                 }
             }
+            return directory_id;
+        },
 
+        async onChangeFileInput() {
+            const files = [...this.fileInput.el.files];
+            const controllerID = this.actionService.currentController.jsId;
+
+            if (!files.length) {
+                this.notification.add(_t("An error occurred during the upload"));
+                return;
+            }
+
+            const directory_id = this.getUploadDirectoryId();
             if (directory_id === false) {
-                self.actionService.restore(controllerID);
-                return self.notification.add(_t("You must select a directory first"), {
+                this.actionService.restore(controllerID);
+                return this.notification.add(_t("You must select a directory first"), {
                     type: "danger",
                 });
             }
 
-            const attachment_datas = await this.orm.call(
-                "dms.file",
-                "get_dms_files_from_attachments",
-                [],
-                {attachment_ids: attachmentIds}
-            );
-
-            const attachments_args = [];
+            try {
+                for (const file of files) {
+                    await this.uploadFile(file, directory_id);
+                }
+            } catch (error) {
+                const message = (error.data && error.data.message) || error.message;
+                this.notification.add(message, {type: "danger"});
+            }
+            this.actionService.restore(controllerID);
+        },
 
-            attachment_datas.forEach((attachment_data) => {
-                attachments_args.push({
-                    name: attachment_data.name,
-                    content: attachment_data.datas,
-                    mimetype: attachment_data.mimetype,
+        /**
+         * Upload a file chunk by chunk. The session token is kept in the local
+         * storage so that an interrupted upload of the same file resumes where
+         * the server stopped receiving it.
+         *
+         * @param {File} file
+         * @param {Number} directory_id
+         */
+        async uploadFile(file, directory_id) {
+            const storageKey = `dms_upload:${directory_id}:${file.name}:${file.size}:${file.lastModified}`;
+            let token = browser.localStorage.getItem(storageKey);
+            let offset = 0;
+            if (token) {
+                try {
+                    ({offset} = await this.rpc("/dms/upload/status", {token}));
+                } catch {
+                    token = null;
+                }
+            }
+            if (!token) {
+                ({token, offset} = await this.rpc("/dms/upload/init", {
                     directory_id,
-                });
+                    name: file.name,
+                    size: file.size,
+                }));
+                browser.localStorage.setItem(storageKey, token);
+            }
+            while (offset < file.size) {
+                offset = await this.uploadChunk(token, file, offset);
+            }
+            await this.rpc("/dms/upload/finalize", {
+                token,
+                context: this.props.context,
             });
+            browser.localStorage.removeItem(storageKey);
+        },
 
-            this.orm
-                .call("dms.file", "create", [attachments_args], {
-                    context: ctx,
-                })
-                .then(() => {
-                    self.actionService.restore(controllerID);
-                })
-                .catch((error) => {
-                    self.notification.add(error.data.message, {
-                        type: "danger",
-                    });
-                    self.actionService.restore(controllerID);
-                });
+        async uploadChunk(token, file, offset) {
+            for (let attempt = 1; ; attempt++) {
+                let result = null;
+                try {
+                    result = await this.http.post(
+                        "/dms/upload/chunk",
+                        {
+                            csrf_token: odoo.csrf_token,
+                            token,
+                            offset,
+                            chunk: file.slice(offset, offset + UPLOAD_CHUNK_SIZE),
+                        },
+                        "json"
+                    );
+                } catch (error) {
+                    if (attempt >= UPLOAD_MAX_ATTEMPTS) {
+                        throw error;
+                    }
+                    await new Promise((resolve) => setTimeout(resolve, 1000 * attempt));
+                    // Part of the chunk may have been received before the drop
+                    ({offset} = await this.rpc("/dms/upload/status", {token}));
+                    continue;
+                }
+                if (result.error) {
+                    throw new Error(result.error);
+                }
+                return result.offset;
+            }
         },
     };
 }
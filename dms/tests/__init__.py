@@ -5,3 +5,7 @@ from . import test_file_database
 from . import test_file
 from . import test_benchmark
 from . import test_portal
+from . import test_upload_session
+from . import test_integrity
+from . import test_storage_pack
+from . import test_file_version
@@ -4,9 +4,11 @@
 # Copyright 2024 Subteno - Timothée Vannier (https://www.subteno.com).
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import base64
 import os
 
-from odoo.exceptions import UserError
+from odoo.exceptions import AccessError, UserError, ValidationError
+from odoo.tests import new_test_user
 from odoo.tests.common import users
 from odoo.tools import mute_logger
 
@@ -166,6 +168,24 @@ class DirectoryTestCaseBase(StorageDatabaseBaseCase):
             sub_files.exists(), msg="The subfiles should not exist anymore"
         )
 
+    @mute_logger("odoo.models.unlink")
+    def test_unlink_subtree(self):
+        root_directory = self.create_directory(storage=self.storage)
+        sub_directory = self.create_directory(directory=root_directory)
+        directories = sub_directory
+        for _i in range(3):
+            directories |= self.create_directory(directory=directories[-1])
+        files = self.create_file(directory=directories[-1])
+        files |= self.create_file(directory=directories[1])
+        files[1].active = False
+        sub_directory.unlink()
+        self.assertFalse(directories.exists())
+        self.assertFalse(files.with_context(active_test=False).exists())
+        self.assertEqual(
+            (root_directory.count_total_directories, root_directory.count_total_files),
+            (0, 0),
+        )
+
     @users("dms-manager", "dms-user")
     def test_storage(self):
         root_directory = self.create_directory(storage=self.storage)
@@ -266,6 +286,278 @@ class DirectoryTestCaseBase(StorageDatabaseBaseCase):
             msg="The tag_ids field should be a multi range field",
         )
 
+    def test_check_access_token(self):
+        token = self.subdirectory._portal_ensure_token()
+        self.assertTrue(self.subdirectory.check_access_token(token))
+        self.assertTrue(self.file.check_access_token(token))
+        self.assertFalse(self.directory.check_access_token(token))
+        self.assertFalse(self.subdirectory.check_access_token("abc-def"))
+        other = self.create_directory(directory=self.directory)
+        self.assertFalse(self.create_file(directory=other).check_access_token(token))
+        self.assertTrue(
+            self.create_file(
+                directory=self.create_directory(directory=self.subdirectory)
+            ).check_access_token(token)
+        )
+
+    @users("dms-user")
+    def test_compute_permissions(self):
+        directories = self.directory_model.browse(
+            (self.directory | self.subdirectory).ids
+        )
+        for operation in ("create", "read", "unlink", "write"):
+            self.assertEqual(
+                directories.filtered(f"permission_{operation}"),
+                directories._filter_access_rules(operation),
+            )
+        self.assertTrue(directories[0].permission_write)
+
+    def test_permission_access_groups(self):
+        # A DMS user out of the access groups of the directories
+        outsider = new_test_user(
+            self.env, login="dms-outsider", groups="dms.group_dms_user"
+        )
+        directory_model = self.directory_model.with_user(outsider)
+        file_model = self.file_model.with_user(outsider)
+        self.assertFalse(directory_model.search([("id", "=", self.subdirectory.id)]))
+        self.assertFalse(file_model.search([("id", "=", self.file.id)]))
+        with self.assertRaises(AccessError):
+            self.subdirectory.with_user(outsider).check_access_rule("read")
+        read_group = self.access_group_model.create(
+            {"name": "Read", "explicit_user_ids": [(6, 0, outsider.ids)]}
+        )
+        self.directory.group_ids |= read_group
+        subdirectory = self.subdirectory.with_user(outsider)
+        self.assertEqual(
+            directory_model.search([("id", "=", self.subdirectory.id)]), subdirectory
+        )
+        self.assertEqual(file_model.search([("id", "=", self.file.id)]), self.file)
+        self.assertTrue(subdirectory.permission_read)
+        self.assertFalse(subdirectory.permission_write)
+        with self.assertRaises(AccessError):
+            subdirectory.check_access_rule("write")
+        with self.assertRaises(AccessError):
+            self.file.with_user(outsider).check_access_rule("unlink")
+
+    def test_permission_explain(self):
+        explain = self.env["dms.permission.explain"].create(
+            {"user_id": self.dms_user.id, "model": "dms.directory"}
+        )
+        explain.action_explain()
+        lines = explain.line_ids
+        self.assertEqual(lines[:2].mapped("name"), ["Access Groups", "Inheritance"])
+        total = lines.filtered("is_total")
+        self.assertEqual(len(total), 1)
+        self.assertIn("dms_directory", total.query)
+        self.assertTrue(total.plan)
+        self.assertEqual(
+            total.record_count,
+            self.directory_model.with_user(self.dms_user)
+            .with_context(active_test=False)
+            .search_count([]),
+        )
+
+    def test_propagate_complete_groups(self):
+        child = self.create_directory(directory=self.subdirectory)
+        isolated = self.create_directory(directory=self.subdirectory)
+        isolated.inherit_group_ids = False
+        isolated_child = self.create_directory(directory=isolated)
+        group = self.access_group_model.create({"name": "Propagated"})
+        self.directory.group_ids |= group
+        for directory in (self.directory, self.subdirectory, child):
+            self.assertIn(group, directory.complete_group_ids)
+        self.assertNotIn(group, isolated.complete_group_ids)
+        self.assertNotIn(group, isolated_child.complete_group_ids)
+        self.assertIn(child, group.complete_directory_ids)
+        # Moved out of the isolated subtree
+        isolated_child.parent_id = child
+        self.assertIn(group, isolated_child.complete_group_ids)
+        self.directory.group_ids -= group
+        self.assertFalse(
+            group.complete_directory_ids,
+            "The group should be removed from the whole subtree",
+        )
+
+    def test_access_group_users(self):
+        parent = self.access_group_model.create(
+            {
+                "name": "Parent",
+                "perm_write": True,
+                "explicit_user_ids": [(6, 0, self.user.ids)],
+            }
+        )
+        res_group = self.env["res.groups"].create({"name": "DMS Readers"})
+        child = self.access_group_model.create(
+            {
+                "name": "Child",
+                "parent_group_id": parent.id,
+                "group_ids": [(6, 0, res_group.ids)],
+                "explicit_user_ids": [(5, 0, 0)],
+            }
+        )
+        self.assertEqual(child.users, self.user)
+        self.assertTrue(child.perm_inclusive_write)
+        self.assertFalse(child.perm_inclusive_unlink)
+        self.dms_user.groups_id |= res_group
+        self.assertEqual(child.users, self.user | self.dms_user)
+        self.assertEqual(child.count_users, 2)
+        self.assertEqual(parent.users, self.user)
+        parent.perm_write = False
+        self.assertFalse(child.perm_inclusive_write)
+        parent.explicit_user_ids = False
+        self.assertEqual(child.users, self.dms_user)
+        self.assertEqual(child._sync_users(), 0, "Nothing should change")
+
+    def test_access_group_users_res_groups(self):
+        res_group = self.env["res.groups"].create({"name": "DMS Readers"})
+        access_group = self.access_group_model.create(
+            {
+                "name": "Readers",
+                "group_ids": [(6, 0, res_group.ids)],
+                "explicit_user_ids": [(5, 0, 0)],
+            }
+        )
+        # Users added to the implied groups by SQL
+        implying = self.env["res.groups"].create(
+            {"name": "Implying", "implied_ids": [(6, 0, res_group.ids)]}
+        )
+        implying.users = [(4, self.dms_user.id)]
+        self.assertEqual(access_group.users, self.dms_user)
+        other = self.env["res.groups"].create(
+            {"name": "Other", "users": [(6, 0, self.user.ids)]}
+        )
+        other.implied_ids = [(4, res_group.id)]
+        self.assertEqual(access_group.users, self.user | self.dms_user)
+        res_group.unlink()
+        self.assertFalse(access_group.users, "Deleted groups give no access")
+
+    def test_complete_name_rename(self):
+        child = self.create_directory(directory=self.subdirectory)
+        grandchild = self.create_directory(directory=child)
+        self.directory.name = "Renamed"
+        self.assertEqual(
+            grandchild.complete_name,
+            f"Renamed / {self.subdirectory.name} / {child.name} / {grandchild.name}",
+        )
+        # Renamed along with an ancestor
+        (self.directory | child).write({"name": "Both"})
+        self.assertEqual(
+            grandchild.complete_name,
+            f"Both / {self.subdirectory.name} / Both / {grandchild.name}",
+        )
+        child.parent_id = self.directory
+        self.env.invalidate_all()
+        self.assertEqual(grandchild.complete_name, f"Both / Both / {grandchild.name}")
+
+    def test_move_subtree(self):
+        child = self.create_directory(directory=self.subdirectory)
+        grandchild = self.create_directory(directory=child)
+        other_root = self.create_directory(storage=self.storage)
+        self.subdirectory.parent_id = other_root
+        for directory in (self.subdirectory, child, grandchild):
+            self.assertEqual(directory.root_directory_id, other_root)
+        self.assertTrue(
+            grandchild.parent_path.startswith(other_root.parent_path),
+        )
+        self.assertIn(
+            other_root.complete_name, self.subdirectory.message_ids[0].body
+        )
+        self.assertFalse(
+            child.message_ids.filtered(lambda message: "Moved" in message.body)
+        )
+        with self.assertRaises(ValidationError):
+            self.subdirectory.parent_id = grandchild
+        with self.assertRaises(UserError):
+            self.subdirectory.parent_id = self.create_directory(
+                storage=self.new_storage
+            )
+
+    def test_directory_totals(self):
+        def totals(directory):
+            return (
+                directory.count_total_directories,
+                directory.count_total_files,
+                directory.size,
+            )
+
+        parent = self.create_directory(directory=self.subdirectory)
+        child = self.create_directory(directory=parent)
+        dms_file = self.create_file(directory=child)
+        root_totals = totals(self.directory)
+        self.assertEqual(totals(parent), (1, 1, 6))
+        self.assertEqual(totals(child), (0, 1, 6))
+        # Resized
+        dms_file.content = base64.b64encode(b"more data")
+        self.assertEqual(totals(parent), (1, 1, 9))
+        self.assertEqual(self.directory.size, root_totals[2] + 3)
+        # Moved with its file
+        child.parent_id = self.directory
+        self.assertEqual(totals(parent), (0, 0, 0))
+        self.assertEqual(totals(self.directory)[:2], root_totals[:2])
+        self.assertEqual(self.directory.size, root_totals[2] + 3)
+        # Archived and deleted
+        dms_file.active = False
+        self.assertEqual(totals(child), (0, 0, 0))
+        dms_file.active = True
+        self.assertEqual(totals(child), (0, 1, 9))
+        dms_file.unlink()
+        child.unlink()
+        expected = totals(self.directory)
+        self.assertEqual(expected[0], root_totals[0] - 1)
+        self.assertEqual(expected[1], root_totals[1] - 1)
+        # Repaired
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE dms_directory SET count_total_files = 42, size = 0 WHERE id = %s",
+            (self.directory.id,),
+        )
+        self.directory.invalidate_recordset()
+        self.assertTrue(self.directory_model._repair_totals())
+        self.assertEqual(totals(self.directory), expected)
+
+    def test_directory_totals_nested_move(self):
+        parent = self.create_directory(directory=self.subdirectory)
+        child = self.create_directory(directory=parent)
+        self.create_file(directory=child)
+        self.create_file(directory=parent)
+        self.directory_model._repair_totals()
+        other = self.create_directory(directory=self.directory)
+        (parent | child).write({"parent_id": other.id})
+        self.assertEqual(
+            (parent.count_total_directories, parent.count_total_files), (0, 1)
+        )
+        self.assertEqual(
+            (other.count_total_directories, other.count_total_files), (2, 2)
+        )
+        self.assertFalse(self.directory_model._repair_totals(), "No drift")
+
+    def test_user_permission_table(self):
+        permission_model = self.env["dms.directory.user.permission"]
+
+        def get_permissions(user):
+            self.env.flush_all()
+            permission_model.invalidate_model()
+            return permission_model.search(
+                [("user_id", "=", user.id), ("directory_id", "=", self.subdirectory.id)]
+            )
+
+        permissions = get_permissions(self.dms_user)
+        self.assertTrue(permissions.perm_write)
+        self.assertFalse(get_permissions(self.user))
+        read_group = self.access_group_model.create(
+            {"name": "Read", "explicit_user_ids": [(6, 0, self.user.ids)]}
+        )
+        self.directory.group_ids |= read_group
+        self.assertEqual(
+            get_permissions(self.user).mapped("perm_write"),
+            [False],
+            "The group should be inherited by the subdirectory",
+        )
+        read_group.perm_write = True
+        self.assertTrue(get_permissions(self.user).perm_write)
+        read_group.explicit_user_ids = False
+        self.assertFalse(get_permissions(self.user))
+
 
 class DirectoryMailTestCase(StorageDatabaseBaseCase):
     @classmethod
@@ -144,6 +144,13 @@ class FileFilestoreTestCase(StorageFileBaseCase):
         self.assertTrue(object_file.export_data(["content"]))
         object_file.unlink()
 
+    @users("dms-manager", "dms-user")
+    def test_open_content(self):
+        object_file = self.create_file(directory=self.directory)
+        with object_file.open_content() as stream:
+            self.assertEqual(stream.read(), b"\xff data")
+        self.assertTrue(object_file.content_file, "Content is in the filestore")
+
     def test_content_file_mimetype(self):
         file_svg = self.env.ref("dms.file_05_demo")
         self.assertEqual(file_svg.mimetype, "image/svg+xml", msg="SVG mimetype")
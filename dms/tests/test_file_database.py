@@ -3,6 +3,14 @@
 # Copyright 2021-2022 Tecnativa - Víctor Martínez
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import base64
+import io
+import os
+import zipfile
+from unittest.mock import patch
+
+from PIL import Image
+
 from odoo.exceptions import UserError
 from odoo.tests.common import users
 from odoo.tools import mute_logger
@@ -88,6 +96,70 @@ class FileDatabaseTestCase(StorageDatabaseBaseCase):
     def test_compute_thumbnail(self):
         self.assertTrue(self.file_demo_01.image_128, "Thumbnail should be computed")
 
+    @users("dms-manager", "dms-user")
+    def test_thumbnail_queue(self):
+        stream = io.BytesIO()
+        Image.new("RGB", (2400, 1200), "blue").save(stream, format="JPEG")
+        dms_file = self.create_file(
+            directory=self.directory, content=base64.b64encode(stream.getvalue())
+        )
+        queue = self.env["dms.thumbnail.queue"].sudo()
+        self.assertFalse(dms_file.image_1920)
+        self.assertTrue(queue.search([("file_id", "=", dms_file.id)]))
+        queue._process_queue(workers=2)
+        self.assertFalse(queue.search([("file_id", "=", dms_file.id)]))
+        dms_file.invalidate_recordset()
+        with Image.open(io.BytesIO(base64.b64decode(dms_file.image_1920))) as image:
+            self.assertEqual(image.size, (1920, 960))
+        self.assertTrue(dms_file.image_128)
+
+    def test_thumbnail_queue_unreadable_content(self):
+        stream = io.BytesIO()
+        Image.new("RGB", (200, 100), "blue").save(stream, format="JPEG")
+        content = base64.b64encode(stream.getvalue())
+        missing = self.create_file(directory=self.directory, content=content)
+        readable = self.create_file(directory=self.directory, content=content)
+        queue = self.env["dms.thumbnail.queue"].sudo()
+        item = queue.search([("file_id", "=", missing.id)])
+        file_class = type(self.env["dms.file"])
+        open_content = file_class.open_content
+
+        def open_or_fail(record, *args, **kwargs):
+            if record == missing:
+                raise FileNotFoundError("missing from the filestore")
+            return open_content(record, *args, **kwargs)
+
+        with patch.object(file_class, "open_content", open_or_fail):
+            queue._process_queue()
+        self.assertEqual(item.attempts, 1)
+        self.assertIn("missing", item.error)
+        self.assertFalse(queue.search([("file_id", "=", readable.id)]))
+        # Moved to another storage, the content and its thumbnail are kept
+        readable.invalidate_recordset()
+        readable.write({"checksum": readable.checksum})
+        self.assertTrue(readable.image_1920)
+        self.assertFalse(queue.search([("file_id", "=", readable.id)]))
+
+    @users("dms-manager", "dms-user")
+    def test_thumbnail_queue_large_image(self):
+        stream = io.BytesIO()
+        Image.new("L", (3000, 2000)).save(stream, format="PNG")
+        dms_file = self.create_file(
+            directory=self.directory, content=base64.b64encode(stream.getvalue())
+        )
+        queue = self.env["dms.thumbnail.queue"].sudo()
+        item = queue.search([("file_id", "=", dms_file.id)])
+        # Larger than the memory ceiling: refused without decoding it
+        queue._process_queue(max_pixels=1_000_000, max_memory=1_000_000)
+        self.assertTrue(item.deferred)
+        self.assertEqual(item.attempts, 1)
+        self.assertFalse(dms_file.image_1920)
+        # Deferred to the pass rendering one image at a time
+        queue._process_queue(max_pixels=1_000_000, max_memory=10_000_000)
+        self.assertFalse(item.exists())
+        dms_file.invalidate_recordset()
+        self.assertTrue(dms_file.image_128)
+
     @users("dms-manager", "dms-user")
     def test_compute_path_names(self):
         self.assertTrue(self.file.path_names, "Path names should be computed")
@@ -104,6 +176,19 @@ class FileDatabaseTestCase(StorageDatabaseBaseCase):
     def test_compute_extension(self):
         self.assertTrue(self.file.extension, "Extension should be computed")
 
+    @users("dms-manager", "dms-user")
+    def test_compute_icon_url(self):
+        icon_map = self.file_model.get_icon_map()
+        self.assertEqual(icon_map["icons"]["pdf"], "/dms/static/icons/file_pdf.svg")
+        self.assertNotIn("unknown", icon_map["icons"])
+        dms_file = self.create_file(directory=self.directory)
+        dms_file.name = "file.pdf"
+        self.assertEqual(dms_file.icon_url, "/dms/static/icons/file_pdf.svg?crop=1")
+        dms_file.name = "file.unknown-extension"
+        self.assertEqual(
+            dms_file.icon_url, "/dms/static/icons/file_unknown.svg?crop=1"
+        )
+
     @users("dms-manager", "dms-user")
     def test_size_calculation(self):
         self.assertTrue(self.file.size, "Size should be computed")
@@ -128,6 +213,30 @@ class FileDatabaseTestCase(StorageDatabaseBaseCase):
             "Content should be different",
         )
 
+    @users("dms-manager", "dms-user")
+    def test_compute_mimetype_header(self):
+        edifact = b"UNA:+.? 'UNB+UNOC:3+SENDER+RECEIVER'" + os.urandom(20000)
+        dms_file = self.create_file(
+            directory=self.directory, content=base64.b64encode(edifact)
+        )
+        self.assertEqual(dms_file.mimetype, "application/EDIFACT")
+        self.assertEqual(dms_file._read_content_headers(4), {dms_file.id: b"UNA:"})
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, "w") as archive:
+            archive.writestr("[Content_Types].xml", "<Types/>")
+            archive.writestr("word/document.xml", "<document/>")
+            archive.writestr("media/padding.bin", os.urandom(20000))
+        dms_file.content = base64.b64encode(stream.getvalue())
+        self.assertEqual(
+            dms_file.mimetype,
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        )
+
+    @users("dms-manager", "dms-user")
+    def test_open_content(self):
+        with self.file.open_content() as stream:
+            self.assertEqual(stream.read(), base64.b64decode(self.content_base64()))
+
     @users("dms-manager", "dms-user")
     def test_compute_save_type(self):
         self.assertTrue(self.file.save_type, "Save type should be computed")
@@ -0,0 +1,84 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import base64
+import os
+
+from odoo.exceptions import AccessError
+from odoo.tests import new_test_user
+from odoo.tests.common import users
+
+from .common import StorageDatabaseBaseCase
+
+
+class FileVersionTestCase(StorageDatabaseBaseCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.storage.write({"keep_versions": True, "version_snapshot_interval": 3})
+        cls.contents = [os.urandom(10000)]
+        for index in range(5):
+            # Each version edits the previous one
+            previous = cls.contents[-1]
+            cls.contents.append(previous[: index * 100] + b"edit" + previous[2000:])
+
+    @users("dms-manager", "dms-user")
+    def test_versions(self):
+        dms_file = self.create_file(
+            directory=self.directory, content=base64.b64encode(self.contents[0])
+        )
+        self.assertFalse(dms_file.version_ids, "New files have no versions")
+        for content in self.contents[1:]:
+            dms_file.content = base64.b64encode(content)
+        dms_file.content = base64.b64encode(self.contents[-1])
+        versions = dms_file.version_ids.sorted("version")
+        self.assertEqual(len(versions), 5, "Unchanged contents make no version")
+        self.assertEqual(
+            versions.mapped("kind"),
+            ["snapshot", "delta", "delta", "snapshot", "delta"],
+        )
+        for version, content in zip(versions, self.contents):
+            self.assertEqual(version._get_content(), content)
+        self.assertGreater(dms_file.version_saved_size, 0)
+        versions[1].action_restore()
+        self.assertEqual(base64.b64decode(dms_file.content), self.contents[1])
+        self.assertEqual(dms_file.version_count, 6)
+        self.assertEqual(dms_file.version_ids[0]._get_content(), self.contents[-1])
+
+    def test_unlink_version(self):
+        dms_file = self.create_file(
+            directory=self.directory, content=base64.b64encode(self.contents[0])
+        )
+        for content in self.contents[1:]:
+            dms_file.content = base64.b64encode(content)
+        versions = dms_file.version_ids.sorted("version")
+        # A delta and the snapshot the next deltas are based on
+        (versions[1] | versions[3]).unlink()
+        remaining = dms_file.version_ids.sorted("version")
+        self.assertEqual(
+            remaining.mapped("kind"), ["snapshot", "snapshot", "snapshot"]
+        )
+        for version, content in zip(
+            remaining, [self.contents[0], self.contents[2], self.contents[4]]
+        ):
+            self.assertEqual(version._get_content(), content)
+
+    def test_versions_access(self):
+        dms_file = self.create_file(
+            directory=self.directory, content=base64.b64encode(self.contents[0])
+        )
+        dms_file.content = base64.b64encode(self.contents[1])
+        version = dms_file.version_ids
+        # A DMS user out of the access groups of the directory
+        outsider = new_test_user(
+            self.env, login="dms-outsider", groups="dms.group_dms_user"
+        )
+        version_model = self.env["dms.file.version"].with_user(outsider)
+        self.assertFalse(version_model.search([("file_id", "=", dms_file.id)]))
+        with self.assertRaises(AccessError):
+            version.with_user(outsider).read(["data"])
+        self.assertEqual(
+            version_model.with_user(self.dms_user).search(
+                [("file_id", "=", dms_file.id)]
+            ),
+            version,
+        )
@@ -0,0 +1,58 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from .common import StorageDatabaseBaseCase
+
+
+class IntegrityTestCase(StorageDatabaseBaseCase):
+    def _scrub(self, start_file):
+        run = self.env["dms.scrub.run"].create({"last_file_id": start_file.id - 1})
+        run._scrub(batch_size=1, bytes_per_second=0, max_duration=60)
+        return run
+
+    def test_scrub(self):
+        file_01 = self.create_file(directory=self.directory)
+        file_02 = self.create_file(directory=self.directory)
+        run = self._scrub(file_01)
+        self.assertTrue(run.is_complete)
+        self.assertGreaterEqual(run.file_count, 2)
+        self.assertFalse(run.issue_ids)
+        self.env.cr.execute(
+            "UPDATE dms_file SET content_binary = %s WHERE id = %s",
+            (b"corrupted", file_02.id),
+        )
+        file_02.invalidate_recordset()
+        run = self._scrub(file_01)
+        self.assertEqual(run.issue_ids.file_id, file_02)
+        self.assertEqual(run.issue_ids.expected_checksum, file_02.checksum)
+        self.assertEqual(run.issue_ids.state, "open")
+        file_02.content = self.content_base64()
+        run = self._scrub(file_01)
+        issue = self.env["dms.integrity.issue"].search([("file_id", "=", file_02.id)])
+        self.assertEqual(issue.state, "resolved", "Repaired files resolve issues")
+
+    def test_scrub_corrupted_compression(self):
+        file_01 = self.create_file(directory=self.directory)
+        file_02 = self.create_file(directory=self.directory)
+        self.env.cr.execute(
+            """
+            UPDATE dms_file SET content_binary = %s, content_compression = 'zlib'
+            WHERE id = %s
+            """,
+            (b"corrupted", file_01.id),
+        )
+        file_01.invalidate_recordset()
+        run = self._scrub(file_01)
+        self.assertTrue(run.is_complete, "Corrupted contents do not stop the run")
+        self.assertEqual(run.issue_ids.file_id, file_01)
+        self.assertTrue(run.issue_ids.error)
+        self.assertGreaterEqual(run.file_count, 2)
+        self.assertNotIn(file_02, run.issue_ids.file_id)
+
+    def test_cron_resume(self):
+        self.env["dms.scrub.run"].create({"last_file_id": self.file.id})
+        self.env["ir.config_parameter"].sudo().set_param("dms.scrub_max_duration", 0)
+        run = self.env["dms.scrub.run"]._cron_scrub()
+        self.assertEqual(run.start_file_id, self.file.id, "Runs resume")
+        run.is_complete = True
+        run = self.env["dms.scrub.run"]._cron_scrub()
+        self.assertEqual(run.start_file_id, 0, "Complete runs start over")
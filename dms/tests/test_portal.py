@@ -1,6 +1,11 @@
 # Copyright 2021-2022 Tecnativa - Víctor Martínez
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl)
 
+import base64
+import io
+
+from PIL import Image
+
 import odoo.tests
 from odoo.exceptions import AccessError
 from odoo.tests.common import users
@@ -45,6 +50,64 @@ class TestDmsPortal(odoo.tests.HttpCase, StorageAttachmentBaseCase):
             response.status_code, 200, "Can access directory with correct access_token"
         )
 
+    def test_download_range(self):
+        self.authenticate("portal", "portal")
+        database_directory = self.create_directory(
+            storage=self.create_storage(save_type="database")
+        )
+        for dms_file in (
+            self.file_partner,
+            self.create_file(directory=database_directory),
+        ):
+            with self.subTest(save_type=dms_file.storage_id.save_type):
+                url = "{}?access_token={}".format(
+                    dms_file.access_url, dms_file._portal_ensure_token()
+                )
+                response = self.url_open(url, timeout=20)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, b"\xff data")
+                response = self.url_open(
+                    url, headers={"Range": "bytes=1-4"}, timeout=20
+                )
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response.content, b" dat")
+                self.assertEqual(response.headers["Content-Range"], "bytes 1-4/6")
+
+    def test_thumbnail_cache(self):
+        stream = io.BytesIO()
+        Image.new("RGB", (300, 200), "red").save(stream, format="PNG")
+        dms_file = self.create_file(
+            directory=self.directory_partner,
+            content=base64.b64encode(stream.getvalue()),
+        )
+        self.env["dms.thumbnail.queue"].sudo()._process_queue()
+        dms_file.invalidate_recordset()
+        self.assertTrue(
+            dms_file.icon_url.startswith(
+                f"/dms/file/{dms_file.id}/thumbnail/{dms_file.checksum}"
+            )
+        )
+        url = "{}&access_token={}".format(
+            dms_file.icon_url, dms_file._portal_ensure_token()
+        )
+        response = self.url_open(url, timeout=20)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        self.assertIn("private", response.headers["Cache-Control"])
+        self.assertNotIn("public", response.headers["Cache-Control"])
+        etag = response.headers["ETag"]
+        response = self.url_open(url, headers={"If-None-Match": etag}, timeout=20)
+        self.assertEqual(response.status_code, 304)
+        # Outdated checksum: redirected to the current thumbnail
+        response = self.url_open(
+            url.replace(dms_file.checksum, "0" * 40), allow_redirects=False, timeout=20
+        )
+        self.assertEqual(response.status_code, 303)
+        response = self.url_open(
+            f"/dms/file/{dms_file.id}/thumbnail/{dms_file.checksum}", timeout=20
+        )
+        self.assertEqual(response.status_code, 404, "Needs an access token")
+
     def test_tour(self):
         for tour in ("dms_portal_mail_tour", "dms_portal_partners_tour"):
             with self.subTest(tour=tour):
@@ -89,3 +152,15 @@ class TestDmsPortal(odoo.tests.HttpCase, StorageAttachmentBaseCase):
             file.check_access_rule("write")
         with self.assertRaises(AccessError, msg="Portal user should not have access"):
             file.check_access_rule("unlink")
+
+    def test_permission_portal_user_access_groups(self):
+        directory = self.create_directory(storage=self.create_storage())
+        dms_file = self.create_file(directory=directory)
+        file_model = self.file_model.with_user(self.portal_user)
+        self.assertFalse(file_model.search([("id", "=", dms_file.id)]))
+        directory.group_ids |= self.access_group_model.create(
+            {"name": "Portal", "explicit_user_ids": [(6, 0, self.portal_user.ids)]}
+        )
+        self.assertEqual(file_model.search([("id", "=", dms_file.id)]), dms_file)
+        with self.assertRaises(AccessError, msg="Access groups only grant reading"):
+            dms_file.with_user(self.portal_user).check_access_rule("write")
@@ -3,7 +3,10 @@
 # Copyright 2024 Subteno - Timothée Vannier (https://www.subteno.com).
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+from unittest.mock import patch
+
 from odoo.exceptions import AccessError
+from odoo.tests import new_test_user
 from odoo.tests.common import users
 from odoo.tools import mute_logger
 
@@ -49,6 +52,68 @@ class StorageAttachmentTestCase(StorageAttachmentBaseCase):
         directories = self.env["dms.directory"].search([])
         self.assertNotIn(directory.id, directories.ids)
 
+    @users("dms-user")
+    def test_storage_attachment_cache_inherited_domain(self):
+        self._create_attachment("demo.txt")
+        directory_model = self.env["dms.directory"]
+        compute = type(directory_model)._compute_domain_by_inheritance
+        with patch.object(
+            type(directory_model),
+            "_compute_domain_by_inheritance",
+            autospec=True,
+            side_effect=compute,
+        ) as mock:
+            domain = directory_model._get_domain_by_inheritance("read")
+            self.assertEqual(directory_model._get_domain_by_inheritance("read"), domain)
+            self.assertEqual(mock.call_count, 1, "The domain should be cached")
+            # Records linked to other records
+            self._create_attachment("other.txt")
+            directory_model._get_domain_by_inheritance("read")
+            self.assertEqual(mock.call_count, 2)
+            # Linked records changed
+            self.partner.sudo().name = "renamed partner"
+            directory_model._get_domain_by_inheritance("read")
+            self.assertEqual(mock.call_count, 3)
+            # Records of models not linked to any storage
+            self.env["res.country"].sudo().search([], limit=1).name = "renamed"
+            directory_model._get_domain_by_inheritance("read")
+            self.assertEqual(mock.call_count, 3, "Unrelated writes keep the cache")
+            directory_model._get_domain_by_inheritance("write")
+            self.assertEqual(mock.call_count, 4, "Cached per operation")
+            manager_directory_model = directory_model.with_user(self.dms_manager_user)
+            manager_directory_model._get_domain_by_inheritance("read")
+            self.assertEqual(mock.call_count, 5, "Cached per user")
+
+    @users("dms-user")
+    def test_storage_attachment_revoke_inherited_access(self):
+        self._create_attachment("demo.txt")
+        file_model = self.env["dms.file"]
+        domain = [("name", "=", "demo.txt")]
+        self.assertTrue(file_model.search(domain))
+        other_company = self.env["res.company"].sudo().create({"name": "Other"})
+        # The user is no longer allowed to read the linked partner
+        self.partner.sudo().company_id = other_company
+        self.assertFalse(file_model.search(domain))
+
+    def test_storage_attachment_inherited_permissions(self):
+        self._create_attachment("demo.txt")
+        dms_file = self.storage.storage_file_ids.filtered(
+            lambda x: x.name == "demo.txt"
+        )
+        # Out of the access groups, the access follows the one to the partner
+        outsider = new_test_user(
+            self.env, login="dms-outsider", groups="dms.group_dms_user"
+        )
+        dms_file = dms_file.with_user(outsider)
+        self.assertTrue(dms_file.permission_read)
+        self.assertFalse(dms_file.permission_write)
+        with self.assertRaises(AccessError):
+            dms_file.check_access_rule("write")
+        outsider.groups_id |= self.env.ref("base.group_partner_manager")
+        dms_file.invalidate_recordset()
+        self.assertTrue(dms_file.permission_write)
+        dms_file.check_access_rule("write")
+
     @mute_logger("odoo.models.unlink")
     def test_storage_attachment_unlink_lock_file(self):
         group_partner_manager = self.env.ref("base.group_partner_manager")
@@ -3,6 +3,10 @@
 # Copyright 2022 Víctor Martínez
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import base64
+import os
+from unittest.mock import patch
+
 from odoo.tests.common import users
 from odoo.tools import mute_logger
 
@@ -10,9 +14,15 @@ from .common import StorageDatabaseBaseCase
 
 
 class StorageDatabaseTestCase(StorageDatabaseBaseCase):
+    def _migrate(self):
+        self.storage.action_storage_migrate()
+        self.env["dms.storage.migration"].sudo()._cron_process_migrations()
+
     @users("dms-manager")
     def test_action_storage_migrate(self):
         self.storage.action_storage_migrate()
+        job = self.storage.migration_ids
+        self.assertEqual(job.state, "running", "Migrated by the cron")
 
     @users("dms-manager", "dms-user")
     def test_count_storage_directories(self):
@@ -55,7 +65,7 @@ class StorageDatabaseTestCase(StorageDatabaseBaseCase):
         )
         self.assertEqual(file_02.storage_id.save_type, "file", "Storage should be file")
         self.assertEqual(file_02.save_type, "file", "File savetype should be file")
-        self.storage.action_storage_migrate()
+        self._migrate()
         self.assertEqual(
             file_01.storage_id, self.storage, "File should be in the storage"
         )
@@ -67,7 +77,7 @@ class StorageDatabaseTestCase(StorageDatabaseBaseCase):
         self.assertEqual(file_02.storage_id.save_type, "file", "Storage should be file")
         self.assertEqual(file_02.save_type, "file", "File savetype should be file")
         self.storage.write({"save_type": "database"})
-        self.storage.action_storage_migrate()
+        self._migrate()
         self.assertEqual(
             file_01.storage_id, self.storage, "File should be in the storage"
         )
@@ -117,7 +127,7 @@ class StorageDatabaseTestCase(StorageDatabaseBaseCase):
         self.assertEqual(
             file_03.save_type, "database", "File savetype should be database"
         )
-        self.storage.action_storage_migrate()
+        self._migrate()
         self.assertEqual(
             file_02.storage_id, self.storage, "File should be in the storage"
         )
@@ -136,3 +146,84 @@ class StorageDatabaseTestCase(StorageDatabaseBaseCase):
         self.assertEqual(
             file_03.save_type, "database", "File savetype should be database"
         )
+
+    @users("dms-manager")
+    @mute_logger("odoo.models.unlink")
+    def test_deduplicate_content(self):
+        self.storage.sudo().deduplicate_content = True
+        file_01 = self.create_file(directory=self.directory)
+        file_02 = self.create_file(directory=self.directory)
+        blob = file_01.sudo().blob_id
+        self.assertTrue(blob, "Content should be stored in a blob")
+        self.assertEqual(file_02.sudo().blob_id, blob, "Blob should be shared")
+        self.assertEqual(blob.ref_count, 2, "Blob should have 2 references")
+        self.assertFalse(file_01.content_binary, "Content should not be duplicated")
+        self.assertEqual(file_01.content, self.content_base64())
+        self.assertEqual(file_01.save_type, "database")
+        file_01.unlink()
+        self.assertEqual(blob.ref_count, 1, "Blob should have 1 reference")
+        file_02.unlink()
+        self.assertFalse(blob.exists(), "Unreferenced blob should be freed")
+
+    def test_compress_content(self):
+        self.storage.sudo().compression = "zlib"
+        text = b"compressible text " * 100
+        dms_file = self.create_file(
+            directory=self.directory, content=base64.b64encode(text)
+        )
+        self.assertEqual(dms_file.content_compression, "zlib")
+        self.assertLess(len(dms_file.content_binary), len(text))
+        self.assertEqual(dms_file.size, len(text), "Size should stay the logical one")
+        self.assertEqual(base64.b64decode(dms_file.content), text)
+        self.assertEqual(b"".join(dms_file._iter_content_binary(5, 40)), text[5:40])
+        self.assertEqual(dms_file._get_content_binary_size(), len(text))
+        random_data = os.urandom(4096)
+        dms_file.content = base64.b64encode(random_data)
+        self.assertFalse(dms_file.content_compression, "Entropy check should skip")
+        self.assertEqual(base64.b64decode(dms_file.content), random_data)
+        self.storage.sudo().compression_mimetypes_allow = "image/*"
+        dms_file.content = base64.b64encode(text)
+        self.assertFalse(dms_file.content_compression, "Type is not allowed")
+
+    @mute_logger("odoo.models.unlink")
+    def test_migration_batches(self):
+        files = self.file | self.create_file(directory=self.directory)
+        files |= self.create_file(directory=self.directory)
+        self.storage.write({"save_type": "file"})
+        self.env["ir.config_parameter"].sudo().set_param("dms.migration_batch_size", 2)
+        job = self.env["dms.storage.migration"]._start(self.storage)
+        self.assertEqual(job.total_count, len(files))
+        self.assertEqual(job.batch_size, 2)
+        job._migrate_batch(files[:2])
+        self.assertEqual(job.last_file_id, files[1].id)
+        self.assertEqual(job.done_count, 2)
+        self.assertEqual(files[:2].mapped("save_type"), ["file", "file"])
+        self.assertFalse(any(files[:2].mapped("require_migration")))
+        # The job resumes after the last migrated batch
+        job._run()
+        self.assertEqual(job.state, "done")
+        self.assertEqual(job.done_count, len(files))
+        self.assertFalse(job.error_count)
+        self.assertEqual(files[2].save_type, "file")
+        self.assertEqual(files[2].content, self.content_base64())
+        self.assertIn(job, self.storage.migration_ids)
+
+    @mute_logger("odoo.addons.dms.models.dms_storage_migration")
+    def test_migration_unreadable_content(self):
+        files = self.file | self.create_file(directory=self.directory)
+        self.storage.write({"save_type": "file"})
+        job = self.env["dms.storage.migration"]._start(self.storage)
+        file_class = type(self.env["dms.file"])
+        open_content = file_class.open_content
+
+        def open_or_fail(record, *args, **kwargs):
+            if record == files[0]:
+                raise FileNotFoundError("missing from the filestore")
+            return open_content(record, *args, **kwargs)
+
+        with patch.object(file_class, "open_content", open_or_fail):
+            job._migrate_batch(files)
+        self.assertEqual(job.last_file_id, files[1].id, "The batch is skipped")
+        self.assertEqual((job.done_count, job.error_count), (1, 1))
+        self.assertIn("missing", job.last_error)
+        self.assertEqual(files[1].save_type, "file")
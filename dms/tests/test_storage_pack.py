@@ -0,0 +1,52 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import base64
+import os
+
+from odoo.tests.common import users
+
+from .common import DocumentsBaseCase
+
+
+class StoragePackTestCase(DocumentsBaseCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.storage = cls.create_storage(save_type="pack")
+        cls.storage.pack_max_file_size = 1
+        cls.directory = cls.create_directory(storage=cls.storage)
+
+    @users("dms-manager", "dms-user")
+    def test_pack_small_files(self):
+        file_01 = self.create_file(directory=self.directory)
+        file_02 = self.create_file(directory=self.directory)
+        self.assertEqual(file_01.save_type, "pack")
+        self.assertEqual(file_01.sudo().pack_segment_id, file_02.sudo().pack_segment_id)
+        self.assertEqual(file_02.pack_offset, file_01.pack_offset + file_01.pack_length)
+        self.assertEqual(file_02.content, self.content_base64())
+        self.assertFalse(file_01.require_migration)
+        with file_02.open_content() as stream:
+            self.assertEqual(stream.read(), b"\xff data")
+
+    @users("dms-manager", "dms-user")
+    def test_pack_large_files(self):
+        content = base64.b64encode(os.urandom(2048))
+        dms_file = self.create_file(directory=self.directory, content=content)
+        self.assertEqual(dms_file.save_type, "file", "Too large to be packed")
+        self.assertFalse(dms_file.require_migration)
+        self.assertEqual(dms_file.content, content)
+
+    def test_pack_compaction(self):
+        file_01 = self.create_file(directory=self.directory)
+        file_02 = self.create_file(directory=self.directory)
+        segment = file_01.pack_segment_id
+        file_01.content = base64.b64encode(b"new content")
+        self.assertEqual(segment.live_size, file_01.pack_length + file_02.pack_length)
+        file_02.unlink()
+        segment.sudo().write({"state": "sealed"})
+        path = segment._get_path()
+        self.env["dms.pack.segment"]._cron_compact_segments()
+        self.assertFalse(segment.exists(), "Mostly dead segments are compacted")
+        self.assertTrue(os.path.exists(path), "Removed once committed only")
+        self.assertNotEqual(file_01.pack_segment_id, segment)
+        self.assertEqual(base64.b64decode(file_01.content), b"new content")
@@ -0,0 +1,69 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import base64
+import hashlib
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests.common import users
+
+from .common import DocumentsBaseCase
+
+
+class UploadSessionTestCase(DocumentsBaseCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.content = b"0123456789" * 10
+
+    def _upload(self, storage, chunk_size=30):
+        directory = self.create_directory(storage=storage)
+        session = self.env["dms.upload.session"].start(
+            directory.id, "test.txt", len(self.content)
+        )
+        for offset in range(0, len(self.content), chunk_size):
+            session.append_chunk(offset, self.content[offset : offset + chunk_size])
+        return session
+
+    @users("dms-manager", "dms-user")
+    def test_upload_storages(self):
+        for save_type in ("database", "file"):
+            with self.subTest(save_type=save_type):
+                session = self._upload(self.create_storage(save_type=save_type))
+                dms_file = session.finalize()
+                self.assertEqual(session.state, "done")
+                self.assertEqual(dms_file.save_type, save_type)
+                self.assertEqual(base64.b64decode(dms_file.content), self.content)
+                self.assertEqual(dms_file.size, len(self.content))
+                self.assertEqual(
+                    dms_file.checksum, hashlib.sha1(self.content).hexdigest()
+                )
+
+    @users("dms-manager", "dms-user")
+    def test_upload_resume(self):
+        directory = self.create_directory(storage=self.create_storage())
+        session = self.env["dms.upload.session"].start(
+            directory.id, "test.txt", len(self.content)
+        )
+        session.append_chunk(0, self.content[:60])
+        with self.assertRaises(UserError, msg="Chunks cannot leave holes"):
+            session.append_chunk(80, self.content[80:])
+        with self.assertRaises(UserError, msg="Corrupted chunks are refused"):
+            session.append_chunk(60, self.content[60:], checksum="0" * 40)
+        with self.assertRaises(UserError, msg="Incomplete uploads are refused"):
+            session.finalize()
+        # Resend data whose acknowledgement was lost
+        self.assertEqual(session.append_chunk(40, self.content[40:]), 100)
+        dms_file = session.finalize()
+        self.assertEqual(base64.b64decode(dms_file.content), self.content)
+
+    @users("dms-manager", "dms-user")
+    def test_upload_running_checksum(self):
+        session = self._upload(self.create_storage(save_type="file"))
+        with patch(
+            "odoo.addons.dms.tools.file.checksum_path",
+            side_effect=AssertionError("The content should not be read again"),
+        ):
+            dms_file = session.with_context(default_color=3).finalize()
+        self.assertEqual(dms_file.checksum, hashlib.sha1(self.content).hexdigest())
+        self.assertEqual(dms_file.color, 3, "The view defaults are applied")
@@ -1 +1,5 @@
 from . import file
+from . import compression
+from . import delta
+from . import sniff
+from . import tree
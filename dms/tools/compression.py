@@ -0,0 +1,128 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import bz2
+import fnmatch
+import lzma
+import math
+import zlib
+from collections import Counter
+
+# Size of the sample whose entropy decides if a content is worth compressing
+ENTROPY_SAMPLE_SIZE = 64 * 1024
+# Above this many bits per byte, a content is most likely already compressed
+ENTROPY_THRESHOLD = 7.5
+
+# Raised when decompressing corrupted or truncated data, bz2 raising OSError
+DECOMPRESSION_ERRORS = (zlib.error, lzma.LZMAError, EOFError, OSError)
+
+ALGORITHMS = {
+    "zlib": (
+        lambda binary, level: zlib.compress(binary, level),
+        zlib.decompressobj,
+    ),
+    "bz2": (
+        lambda binary, level: bz2.compress(binary, max(level, 1)),
+        bz2.BZ2Decompressor,
+    ),
+    "lzma": (
+        lambda binary, level: lzma.compress(binary, preset=level),
+        lzma.LZMADecompressor,
+    ),
+}
+
+
+def entropy(binary):
+    """
+    Compute the Shannon entropy of a binary.
+
+    :param bytes binary: The data to measure.
+
+    :return: The entropy in bits per byte, between 0 and 8.
+    :rtype: float
+    """
+    if not binary:
+        return 0.0
+    length = len(binary)
+    return -sum(
+        count / length * math.log2(count / length)
+        for count in Counter(binary).values()
+    )
+
+
+def is_compressible(binary):
+    """
+    Tell cheaply if a binary is worth compressing.
+
+    Only a sample of the data is measured, so already compressed formats
+    (images, archives, videos...) are skipped without trying to compress them.
+
+    :param bytes binary: The data to check.
+
+    :return: True if the data does not look compressed already.
+    :rtype: bool
+    """
+    return entropy(binary[:ENTROPY_SAMPLE_SIZE]) < ENTROPY_THRESHOLD
+
+
+def match_mimetype(mimetype, patterns):
+    """
+    Check if a mimetype matches one of the given patterns.
+
+    :param str mimetype: The mimetype to check.
+    :param list patterns: Mimetypes, with optional wildcards (e.g: ``image/*``).
+
+    :return: True if the mimetype matches one of the patterns.
+    :rtype: bool
+    """
+    return any(fnmatch.fnmatch(mimetype or "", pattern) for pattern in patterns)
+
+
+def compress(binary, algorithm, level):
+    """
+    Compress a binary.
+
+    :param bytes binary: The data to compress.
+    :param str algorithm: One of the keys of ``ALGORITHMS``.
+    :param int level: The compression level, from 0 to 9.
+
+    :return: The compressed data.
+    :rtype: bytes
+    """
+    return ALGORITHMS[algorithm][0](binary, level)
+
+
+def decompress(binary, algorithm):
+    """
+    Decompress a binary compressed by ``compress``.
+
+    :param bytes binary: The compressed data.
+    :param str algorithm: The algorithm used to compress the data.
+
+    :return: The original data.
+    :rtype: bytes
+    """
+    return b"".join(iter_decompress([binary], algorithm))
+
+
+def iter_decompress(chunks, algorithm):
+    """
+    Decompress a binary given in chunks, without holding it at once.
+
+    :param iterable chunks: The successive parts of the compressed data.
+    :param str algorithm: The algorithm used to compress the data.
+
+    :return: A generator of the decompressed parts.
+    :rtype: generator
+    """
+    decompressor = ALGORITHMS[algorithm][1]()
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    flush = getattr(decompressor, "flush", None)
+    if flush:
+        data = flush()
+        if data:
+            yield data
+    if not decompressor.eof:
+        raise EOFError("Compressed data ended before the end-of-stream marker")
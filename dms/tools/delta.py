@@ -0,0 +1,125 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import struct
+
+# Size of the blocks of the source matched in the target
+DELTA_BLOCK_SIZE = 2048
+# How far the target is searched to find the next expected source blocks
+DELTA_SEARCH_WINDOW = 1024 * 1024
+# Number of upcoming source blocks looked for after a mismatch
+DELTA_LOOKAHEAD = 4
+
+_COPY = struct.Struct(">cQI")
+_LITERAL = struct.Struct(">cI")
+
+
+def _iter_operations(source, target, block_size):
+    """Yield the ``(offset, length)`` copies from the source and the literal
+    ``bytes`` rebuilding the target."""
+    index = {}
+    for offset in range(0, len(source) - block_size + 1, block_size):
+        index.setdefault(source[offset : offset + block_size], offset)
+    literal_start = position = expected = searched_until = 0
+    while position + block_size <= len(target):
+        offset = index.get(target[position : position + block_size])
+        if offset is not None:
+            if literal_start < position:
+                yield target[literal_start:position]
+            yield offset, block_size
+            position += block_size
+            literal_start, expected = position, offset + block_size
+            searched_until = 0
+            continue
+        if position < searched_until:
+            # The expected blocks were not found this far already
+            position += block_size
+            continue
+        # Resynchronize on the blocks which followed the last matched one,
+        # searched at C speed rather than by sliding byte per byte.
+        found = []
+        for block_offset in range(
+            expected, expected + DELTA_LOOKAHEAD * block_size, block_size
+        ):
+            block = source[block_offset : block_offset + block_size]
+            if len(block) < block_size:
+                break
+            match = target.find(
+                block, position + 1, position + DELTA_SEARCH_WINDOW + block_size
+            )
+            if match >= 0:
+                found.append(match)
+        # After a larger deletion, locate the next block of the target in the
+        # source and resume on the following block boundary of the source.
+        probe_position = position + block_size
+        probe = target[probe_position : probe_position + block_size]
+        source_offset = source.find(probe) if len(probe) == block_size else -1
+        if source_offset >= 0:
+            boundary = -(-source_offset // block_size) * block_size
+            found.append(probe_position + boundary - source_offset)
+        if found:
+            position = min(found)
+        else:
+            searched_until = position + DELTA_SEARCH_WINDOW
+            position += block_size
+    if literal_start < len(target):
+        yield target[literal_start:]
+
+
+def make_delta(source, target, block_size=DELTA_BLOCK_SIZE):
+    """
+    Encode a target binary as a delta against a source binary.
+
+    Blocks of the source found in the target are encoded as copies, the rest
+    of the target as literals. The match handles insertions and deletions:
+    after a mismatch, the next blocks of the source are looked for further in
+    the target, and the next block of the target is looked for in the source.
+
+    :param bytes source: The binary the delta is computed against.
+    :param bytes target: The binary to encode.
+    :param int block_size: The size of the matched blocks.
+
+    :return: The delta, to be decoded by ``apply_delta``.
+    :rtype: bytes
+    """
+    parts = []
+    copy = None
+    for operation in _iter_operations(source, target, block_size):
+        if isinstance(operation, tuple):
+            if copy and copy[0] + copy[1] == operation[0]:
+                copy = (copy[0], copy[1] + operation[1])
+                continue
+            if copy:
+                parts.append(_COPY.pack(b"C", *copy))
+            copy = operation
+        else:
+            if copy:
+                parts.append(_COPY.pack(b"C", *copy))
+                copy = None
+            parts.append(_LITERAL.pack(b"L", len(operation)))
+            parts.append(operation)
+    if copy:
+        parts.append(_COPY.pack(b"C", *copy))
+    return b"".join(parts)
+
+
+def apply_delta(source, delta):
+    """
+    Decode a delta made by ``make_delta``.
+
+    :param bytes source: The binary the delta was computed against.
+    :param bytes delta: The delta.
+
+    :return: A generator of the parts of the target binary.
+    :rtype: generator
+    """
+    position = 0
+    while position < len(delta):
+        if delta[position : position + 1] == b"C":
+            _code, offset, length = _COPY.unpack_from(delta, position)
+            position += _COPY.size
+            yield source[offset : offset + length]
+        else:
+            _code, length = _LITERAL.unpack_from(delta, position)
+            position += _LITERAL.size
+            yield delta[position : position + length]
+            position += length
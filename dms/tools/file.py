@@ -3,13 +3,17 @@
 # Copyright 2024 Subteno - Timothée Vannier (https://www.subteno.com).
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import hashlib
 import mimetypes
 import os
 import re
 import shutil
 import tempfile
 
-from odoo.tools.mimetypes import guess_mimetype
+from .sniff import guess_mimetype_header
+
+# Size of the blocks used to read files from disk
+READ_CHUNK_SIZE = 1024 * 1024
 
 
 def check_name(name):
@@ -89,15 +93,72 @@ def guess_extension(filename=None, mimetype=None, binary=None):
 
     :param str filename: The name of the file.
     :param str mimetype: The mimetype of the file.
-    :param str binary: The binary content of the file.
+    :param bytes binary: The content of the file, or only its first bytes.
 
     :return: The extension of the file.
     :rtype: str
     """
     extension = filename and os.path.splitext(filename)[1][1:].strip().lower()
     if not extension and mimetype and mimetype != "application/x-empty":
-        extension = mimetypes.guess_extension(mimetype)[1:].strip().lower()
+        extension = (mimetypes.guess_extension(mimetype) or "")[1:].strip().lower()
     if not extension and binary:
-        mimetype = guess_mimetype(binary, default="")
-        extension = mimetypes.guess_extension(mimetype)[1:].strip().lower()
+        mimetype = guess_mimetype_header(binary, default="")
+        extension = (mimetypes.guess_extension(mimetype) or "")[1:].strip().lower()
     return extension
+
+
+def checksum_path(path, chunk_size=READ_CHUNK_SIZE):
+    """
+    Compute the SHA1 checksum of a file on disk without loading it at once.
+
+    :param str path: The path of the file.
+    :param int chunk_size: The size of the blocks read from the file.
+
+    :return: The hexadecimal SHA1 digest of the file content.
+    :rtype: str
+    """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def spool_stream(stream, directory, chunk_size=READ_CHUNK_SIZE):
+    """
+    Copy a binary stream to a new file, computing its checksum on the way.
+
+    :param file stream: The binary stream to copy, closed once copied.
+    :param str directory: The directory of the new file.
+    :param int chunk_size: The size of the blocks read from the stream.
+
+    :return: The path of the new file and the hexadecimal SHA1 digest of its
+    content.
+    :rtype: tuple
+    """
+    with stream:
+        return spool_chunks(iter(lambda: stream.read(chunk_size), b""), directory)
+
+
+def spool_chunks(chunks, directory):
+    """
+    Write binary chunks to a new file, computing its checksum on the way.
+
+    :param iterable chunks: The successive parts of the content.
+    :param str directory: The directory of the new file.
+
+    :return: The path of the new file and the hexadecimal SHA1 digest of its
+    content.
+    :rtype: tuple
+    """
+    sha1 = hashlib.sha1()
+    fd, path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            for chunk in chunks:
+                sha1.update(chunk)
+                spool.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, sha1.hexdigest()
@@ -0,0 +1,80 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import re
+
+from odoo.tools.mimetypes import guess_mimetype
+
+# Number of bytes at the start of a content read to detect its type
+HEADER_SIZE = 8 * 1024
+
+# (offset, signature, mimetype) of formats not detected from their header by
+# the standard detection, checked before it.
+MAGIC_NUMBERS = [
+    (0, b"UNA", "application/EDIFACT"),
+    (0, b"UNB+", "application/EDIFACT"),
+    (0, b"ISA*", "application/EDI-X12"),
+    (4, b"ftypisom", "video/mp4"),
+    (4, b"ftypiso2", "video/mp4"),
+    (4, b"ftypmp41", "video/mp4"),
+    (4, b"ftypmp42", "video/mp4"),
+    (4, b"ftypavc1", "video/mp4"),
+    (4, b"ftypqt  ", "video/quicktime"),
+]
+
+ZIP_SIGNATURE = b"PK\x03\x04"
+# The first entry of OpenDocument archives is an uncompressed "mimetype" file
+ODF_MIMETYPE = re.compile(
+    rb"^PK\x03\x04.{26}mimetype(application/[\w.+-]+)", re.S
+)
+# Office Open XML archives are recognized by the names of their first parts
+OOXML_PARTS = [
+    (
+        b"word/",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ),
+    (
+        b"xl/",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ),
+    (
+        b"ppt/",
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ),
+]
+SVG = re.compile(
+    rb"^\s*(<\?xml[^>]*>\s*)?(<!--.*?-->\s*|<!DOCTYPE[^>]*>\s*)*<svg", re.S
+)
+
+
+def guess_mimetype_header(
+    header, magic_numbers=None, default="application/octet-stream"
+):
+    """
+    Guess the mimetype of a content from its first bytes only.
+
+    :param bytes header: The first bytes of the content, at least
+    ``HEADER_SIZE`` of them unless the content is shorter.
+    :param list magic_numbers: ``(offset, signature, mimetype)`` entries checked
+    first, ``MAGIC_NUMBERS`` by default.
+    :param str default: The mimetype of unknown contents.
+
+    :return: The mimetype of the content.
+    :rtype: str
+    """
+    if magic_numbers is None:
+        magic_numbers = MAGIC_NUMBERS
+    for offset, signature, mimetype in magic_numbers:
+        if header[offset : offset + len(signature)] == signature:
+            return mimetype
+    if header.startswith(ZIP_SIGNATURE):
+        # The central directory of the archive is at its end, out of reach
+        match = ODF_MIMETYPE.match(header)
+        if match:
+            return match.group(1).decode()
+        for part, mimetype in OOXML_PARTS:
+            if b"[Content_Types].xml" in header and part in header:
+                return mimetype
+        return "application/zip"
+    if SVG.match(header):
+        return "image/svg+xml"
+    return guess_mimetype(header, default=default)
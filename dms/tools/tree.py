@@ -0,0 +1,61 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from odoo.tools import SQL
+
+
+def propagate_complete_name(records, old_names):
+    """
+    Recompute the ``complete_name`` of records whose name or parent changed,
+    and rewrite the one of their descendants by a prefix replacement.
+
+    The ORM computes the records themselves, the subtree of each one being
+    updated by a single statement along ``parent_path`` instead of being
+    computed and written one descendant at a time.
+
+    :param records: The renamed or moved records of a ``_parent_store`` model.
+    :param dict old_names: The ``complete_name`` of the records by id, before
+    the change.
+    """
+    model = records.sudo().with_context(active_test=False)
+    field = model._fields["complete_name"]
+    model.flush_model(["name", model._parent_name, "parent_path"])
+    # Parents first, the deeper records depending on their new names
+    records = model.browse(records.ids).sorted(
+        lambda record: record.parent_path.count("/")
+    )
+    # Ordered by id, the default order would compute the complete names
+    descendants = model.search([("id", "child_of", records.ids)], order="id") - records
+    model.env.remove_to_compute(field, descendants)
+    for record in records:
+        record.flush_recordset(["complete_name"])
+        old_name = old_names.get(record.id)
+        if not old_name or old_name == record.complete_name:
+            continue
+        # The subtrees of the other records have their own prefix
+        nested = [
+            other.parent_path
+            for other in records
+            if other != record and other.parent_path.startswith(record.parent_path)
+        ]
+        model.env.cr.execute(
+            SQL(
+                """
+                UPDATE %(table)s AS child
+                SET complete_name = %(new_name)s
+                    || substr(child.complete_name, %(old_length)s + 1)
+                WHERE child.parent_path LIKE %(path)s
+                    AND child.id != %(id)s
+                    AND left(child.complete_name, %(old_length)s + 3)
+                        = %(old_name)s || ' / '
+                    AND NOT child.parent_path LIKE ANY (%(nested)s::varchar[])
+                """,
+                table=SQL.identifier(model._table),
+                new_name=record.complete_name,
+                old_name=old_name,
+                old_length=len(old_name),
+                path=record.parent_path + "%",
+                id=record.id,
+                nested=[path + "%" for path in nested],
+            )
+        )
+        model.invalidate_model(["complete_name"])